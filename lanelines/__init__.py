@@ -0,0 +1,18 @@
+"""
+Lane line detection pipeline.
+
+Importing this package only pulls in NumPy and OpenCV. moviepy is imported the first
+time a video is processed so worker processes that only handle images start quickly.
+"""
+from lanelines.constants import FPS
+from lanelines.camera import CameraUndistorter
+from lanelines.events import PipelineEventLog
+from lanelines.hough import (BandedHoughTransform, HoughThresholdController, HoughTransformPipeline,
+                             PyramidHoughTransform, merge_collinear_segments)
+from lanelines.metrics import MetricsServer, PipelineMetrics
+from lanelines.pipeline import LaneLine, PipelineContext
+from lanelines.presets import PRESETS, create_pipeline_context
+from lanelines.screening import FrameScreen
+from lanelines.sources import ImageSource
+from lanelines.stripes import StripedEdgeDetector
+from lanelines.tracking import LaneKalmanTracker
@@ -0,0 +1,166 @@
+"""
+Clip level lane analytics.
+
+Everything works on whole columns of per frame output at once: `m` and `b` are
+(frames, 2) arrays with the left lane in column 0 and the right lane in column 1, in the
+y = m*x + b image coordinates draw_left_line and draw_right_line fit, NaN where a lane
+wasn't found. lines_from_track turns a stored lane track (see lanelines.render) into that.
+There is no loop over frames anywhere, so a clip of millions of frames takes seconds.
+"""
+import numpy as np
+
+from lanelines.constants import FPS
+
+# wide enough for the longest kind clip_analytics reports, 'lane_change_right'
+EVENT_DTYPE = np.dtype([('kind', 'U24'), ('start', np.int64), ('end', np.int64)])
+
+
+def lines_from_track(lanes):
+    """Returns (m, b), each (frames, 2), of the lines through a track's (frames, 2, 4) endpoints."""
+    lanes = np.asarray(lanes, dtype=np.float64)
+    x1, y1, x2, y2 = np.moveaxis(lanes, 2, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m = (y2 - y1) / (x2 - x1)
+    return m, y1 - m * x1
+
+
+def lane_x(m, b, y):
+    """x where every lane crosses row `y`."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (y - b) / m
+
+
+def run_lengths(mask):
+    """Returns (starts, lengths) of every run of True in the 1d `mask`."""
+    padded = np.concatenate(([0], np.asarray(mask, dtype=np.int8), [0]))
+    changes = np.flatnonzero(np.diff(padded))
+    starts, ends = changes[::2], changes[1::2]
+    return starts, ends - starts
+
+
+def forward_fill(values):
+    """Replaces every NaN with the last value before it that isn't NaN (leading NaNs stay)."""
+    valid = ~np.isnan(values)
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(len(values)), 0))
+    filled = values[last_valid]
+    filled[:np.argmax(valid) if valid.any() else len(values)] = np.nan
+    return filled
+
+
+def lane_changes(offset, width, threshold=0.5, window=2 * FPS):
+    """
+    Frame ranges where the lane center has moved sideways by more than `threshold` lane widths.
+
+    Changing lanes swaps which painted line is the left and which is the right one, so the
+    lane center relative to the camera moves by about a lane width: down when moving into
+    the lane on the left, up when moving right. Raw detections jump in a single frame but
+    the EMA and Kalman smoothing spread that over dozens, so each frame is compared with
+    the lowest and the highest center of the `window` frames up to it. Frames without an
+    offset are bridged with the last known one.
+
+    Drifting towards a line before crossing it moves the center the other way, by less
+    than the change itself, so of two opposite moves starting less than `window` frames
+    apart only the larger one is kept. Returns ((changes, 2) [start, end) frame ranges,
+    directions) with direction -1 for left and 1 for right.
+    """
+    filled = forward_fill(offset)
+    typical_width = np.nanmedian(width) if np.any(~np.isnan(width)) else np.nan
+
+    padded = np.concatenate((np.full(window, np.nan), filled))
+    recent = np.lib.stride_tricks.sliding_window_view(padded, window)[1:]
+    moves = ((-1, np.fmax.reduce(recent, axis=1) - filled), (1, filled - np.fmin.reduce(recent, axis=1)))
+
+    ranges = []
+    directions = []
+    peaks = []
+    for direction, move in moves:
+        with np.errstate(invalid='ignore'):
+            starts, lengths = run_lengths(move > threshold * typical_width)
+        bounds = np.column_stack((starts, starts + lengths))
+        ranges.append(bounds)
+        directions.append(np.full(len(starts), direction, dtype=np.int8))
+        # the largest move of each run, every other reduceat result is the stretch between two runs
+        peaks.append(np.maximum.reduceat(np.append(np.nan_to_num(move), 0.), bounds.ravel())[::2] if len(starts)
+                     else np.empty(0))
+    ranges = np.concatenate(ranges)
+    directions = np.concatenate(directions)
+    peaks = np.concatenate(peaks)
+
+    starts = ranges[:, 0]
+    beaten = (directions[:, np.newaxis] != directions) & (np.abs(starts[:, np.newaxis] - starts) < window) & \
+        (peaks[:, np.newaxis] < peaks)
+    keep = ~beaten.any(axis=1)
+
+    order = np.argsort(starts[keep], kind='stable')
+    return ranges[keep][order], directions[keep][order]
+
+
+def clip_analytics(m, b, frame_shape, y=None, change_threshold=0.5, change_window=2 * FPS, min_missed_run=1):
+    """
+    Per frame lane geometry and the clip's events.
+
+    Lane positions are taken at row `y` (the bottom of the frame by default). `width` is
+    the distance between the lanes there and `offset` how far the lane center is right of
+    the frame center (so positive means the car sits left of center), both in pixels.
+    Missed detection runs shorter than `min_missed_run` frames are left out. Lane changes
+    are moves of the lane center by more than `change_threshold` lane widths within
+    `change_window` frames, see lane_changes.
+    """
+    m = np.asarray(m, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    height, width = frame_shape[:2]
+    if y is None:
+        y = height
+
+    x = lane_x(m, b, y)
+    lane_width = x[:, 1] - x[:, 0]
+    offset = (x[:, 0] + x[:, 1]) / 2. - width / 2.
+
+    missing = np.isnan(x)
+    runs = {}
+    for kind, mask in (('missed_left', missing[:, 0] & ~missing[:, 1]),
+                       ('missed_right', missing[:, 1] & ~missing[:, 0]),
+                       ('missed_both', missing[:, 0] & missing[:, 1])):
+        starts, lengths = run_lengths(mask)
+        keep = lengths >= min_missed_run
+        runs[kind] = np.column_stack((starts[keep], starts[keep] + lengths[keep]))
+
+    changes, directions = lane_changes(offset, lane_width, change_threshold, change_window)
+    runs['lane_change_left'] = changes[directions < 0]
+    runs['lane_change_right'] = changes[directions > 0]
+
+    detected = ~missing.any(axis=1)
+    summary = {
+        'frames': len(m),
+        'both_lanes_rate': float(detected.mean()) if len(m) else 0.,
+        'mean_width_px': float(np.nanmean(lane_width)) if detected.any() else None,
+        'mean_abs_offset_px': float(np.nanmean(np.abs(offset))) if detected.any() else None,
+        'lane_changes': len(changes),
+        'longest_missed_run': int(max([0] + [(run[:, 1] - run[:, 0]).max() for kind, run in runs.items()
+                                             if kind.startswith('missed') and len(run) > 0]))
+    }
+
+    return {'width': lane_width, 'offset': offset, 'events': runs, 'summary': summary}
+
+
+def event_index(events, fps=None):
+    """
+    Flattens clip_analytics' events into one array sorted by start frame.
+
+    Each entry has the event kind and its [start, end) frame range. With `fps` the start and
+    end times in seconds are returned as well, ready to seek a player to.
+    """
+    index = np.empty(sum(len(ranges) for ranges in events.values()), dtype=EVENT_DTYPE)
+
+    position = 0
+    for kind, ranges in events.items():
+        index['kind'][position:position + len(ranges)] = kind
+        index['start'][position:position + len(ranges)] = ranges[:, 0]
+        index['end'][position:position + len(ranges)] = ranges[:, 1]
+        position += len(ranges)
+
+    index = index[np.argsort(index['start'], kind='stable')]
+    if fps is None:
+        return index
+
+    return index, index['start'] / fps, index['end'] / fps
@@ -0,0 +1,166 @@
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Modules that are expensive to import and must only load when video or plotting is used
+HEAVY_MODULES = ('moviepy', 'matplotlib')
+
+
+def measure_import_time(module='lanelines', repeat=5, preload=()):
+    """
+    Imports `module` in `repeat` fresh interpreters and returns (best seconds, heavy modules loaded).
+
+    A fresh interpreter per run is the only way to measure a cold import since
+    Python caches modules after the first import. Modules in `preload` are imported
+    before the clock starts, e.g. preload=('numpy', 'cv2') times only what `module`
+    adds on top of its dependencies.
+    """
+    script = ('import sys, time\n'
+              '{preload}'
+              'start = time.perf_counter()\n'
+              'import {module}\n'
+              'elapsed = time.perf_counter() - start\n'
+              'heavy = sorted(set(name.split(".")[0] for name in sys.modules) & set({heavy!r}))\n'
+              'print(elapsed, ",".join(heavy))\n').format(module=module, heavy=HEAVY_MODULES,
+                                                        preload=''.join('import %s\n' % name for name in preload))
+
+    best = None
+    heavy = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', script], universal_newlines=True)
+        elapsed, loaded = output.strip().partition(' ')[::2]
+        best = float(elapsed) if best is None else min(best, float(elapsed))
+        heavy = [name for name in loaded.split(',') if name]
+
+    return best, heavy
+
+
+def check_import_time(budget=0.5, module='lanelines'):
+    """Raises AssertionError if importing `module` loads a heavy dependency or takes longer than `budget` seconds."""
+    elapsed, heavy = measure_import_time(module)
+    assert not heavy, 'importing %s loaded %s' % (module, ', '.join(heavy))
+    assert elapsed <= budget, 'importing %s took %.3fs (budget %.3fs)' % (module, elapsed, budget)
+    return elapsed
+
+
+def benchmark_detectors(frames, preset='white', **overrides):
+    """
+    Times the lane detection stage of the Hough and histogram detectors on the same masked edges.
+
+    `frames` is any iterable of RGB frames (see lanelines.video.iter_frames). Returns
+    {detector: (mean ms per frame, frames where both lanes were drawn)}.
+    """
+    from lanelines.presets import create_pipeline_context
+
+    contexts = {detector: create_pipeline_context(preset, detector=detector, **overrides)
+                for detector in ('hough', 'histogram')}
+    timings = {detector: [] for detector in contexts}
+    both_lanes = {detector: 0 for detector in contexts}
+
+    for frame in frames:
+        masked_edges = contexts['hough'].find_edges(frame)
+        scratch = np.zeros_like(frame)
+
+        for detector, pipeline_context in contexts.items():
+            pipeline_context.current_frame += 1
+            pipeline_context.update_vertices(frame.shape)
+
+            start = time.perf_counter()
+            if detector == 'histogram':
+                lines = pipeline_context.sliding_window_detector.find_lines(masked_edges, pipeline_context.vertices)
+            else:
+                lines = pipeline_context.hough_transform_pipeline.find_lines(masked_edges)
+            timings[detector].append(time.perf_counter() - start)
+
+            pipeline_context.draw_lines(scratch, lines)
+            if pipeline_context.left_lane is not None and pipeline_context.right_lane is not None:
+                both_lanes[detector] += 1
+
+    return {detector: (np.mean(timings[detector]) * 1e3, both_lanes[detector]) for detector in contexts}
+
+
+def benchmark_hough_modes(frames, preset='white', **hough_overrides):
+    """
+    Times HoughTransformPipeline's 'single' and 'pyramid' modes on the same masked edges.
+
+    Accuracy is measured against the single level path: the mean absolute difference, in
+    pixels, of the drawn lane endpoints of frames where both modes drew that lane.
+    Returns {mode: (mean ms per frame, frames where both lanes were drawn, mean endpoint difference)}.
+    """
+    from lanelines.presets import PRESETS, create_pipeline_context
+
+    hough = dict(PRESETS[preset]['hough_transform_pipeline'] if isinstance(preset, str)
+                 else preset['hough_transform_pipeline'])
+    hough.update(hough_overrides)
+
+    contexts = {mode: create_pipeline_context(preset, hough_transform_pipeline=dict(hough, mode=mode))
+                for mode in ('single', 'pyramid')}
+    timings = {mode: [] for mode in contexts}
+    both_lanes = {mode: 0 for mode in contexts}
+    differences = {mode: [] for mode in contexts}
+
+    for frame in frames:
+        masked_edges = contexts['single'].find_edges(frame)
+        scratch = np.zeros_like(frame)
+
+        for mode, pipeline_context in contexts.items():
+            pipeline_context.current_frame += 1
+            pipeline_context.update_vertices(frame.shape)
+
+            start = time.perf_counter()
+            lines = pipeline_context.hough_transform_pipeline.find_lines(masked_edges)
+            timings[mode].append(time.perf_counter() - start)
+
+            pipeline_context.draw_lines(scratch, lines)
+            if pipeline_context.left_lane is not None and pipeline_context.right_lane is not None:
+                both_lanes[mode] += 1
+
+        for mode, pipeline_context in contexts.items():
+            for lane, reference in ((pipeline_context.left_lane, contexts['single'].left_lane),
+                                    (pipeline_context.right_lane, contexts['single'].right_lane)):
+                if lane is not None and reference is not None:
+                    differences[mode].append(np.abs(np.subtract(lane, reference)).mean())
+
+    return {mode: (np.mean(timings[mode]) * 1e3, both_lanes[mode],
+                   np.mean(differences[mode]) if differences[mode] else np.nan) for mode in contexts}
+
+
+def benchmark_stripes(frame, stripe_counts=(1, 2, 4, 8), repeat=20, preset='white'):
+    """
+    Times blur + Canny on one frame unsplit and with a StripedEdgeDetector per stripe count.
+
+    `frame` is an RGB frame, upscale it to see what a 4K feed would do. Returns
+    {'unsplit' or stripe count: mean ms per frame}. Raises AssertionError if any striped
+    result differs from the unsplit one.
+    """
+    from lanelines.presets import create_pipeline_context
+    from lanelines.stripes import StripedEdgeDetector
+
+    pipeline_context = create_pipeline_context(preset)
+    gray_img = pipeline_context.gray_channel(frame)
+    low_threshold, high_threshold = pipeline_context.canny_low_threshold, pipeline_context.canny_high_threshold
+    expected = pipeline_context.blurred_edges(gray_img, low_threshold, high_threshold)
+
+    def timed(find_edges):
+        find_edges()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            find_edges()
+        return (time.perf_counter() - start) / repeat * 1e3
+
+    results = {'unsplit': timed(lambda: pipeline_context.blurred_edges(gray_img, low_threshold, high_threshold))}
+    for n_stripes in stripe_counts:
+        pipeline_context.edge_detector = StripedEdgeDetector(n_stripes)
+        edges = pipeline_context.blurred_edges(gray_img, low_threshold, high_threshold)
+        assert np.array_equal(edges, expected), '%d stripes changed the edges' % n_stripes
+        results[n_stripes] = timed(lambda: pipeline_context.blurred_edges(gray_img, low_threshold, high_threshold))
+        pipeline_context.edge_detector.executor.shutdown()
+    pipeline_context.edge_detector = None
+
+    return results
+
+
+if __name__ == '__main__':
+    print('import lanelines: %.1f ms' % (check_import_time() * 1e3))
@@ -0,0 +1,117 @@
+"""
+Picks a PipelineContext configuration for a new clip from a few dozen of its frames.
+
+calibrate samples frames spread over the whole video and scores every candidate
+configuration (by default each preset crossed with a few Canny and Hough thresholds) on
+just those frames. The frames are far apart so each is judged on its own, without the
+EMA/Kalman smoothing hiding a bad detection. There are no labels to compare against, so
+the score is what a good configuration does on footage from one fixed camera:
+
+* both lanes are found in as many frames as possible, and
+* the two lanes always meet at about the same vanishing point (a configuration that
+  latches onto the road edge, a car or shadows moves it around from frame to frame).
+
+Candidates are scored in parallel on any concurrent.futures.Executor. The sampled frames
+are written once to `work_dir` and memory-mapped by the workers rather than pickled
+into every task.
+"""
+import concurrent.futures
+import itertools
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from lanelines.analytics import lines_from_track
+from lanelines.presets import PRESETS, create_pipeline_context
+
+
+def candidate_grid(presets=None, canny_thresholds=((50, 150), (30, 90), (80, 200)), hough_thresholds=(10, 20, 35)):
+    """Returns {name: config} for every preset crossed with every (low, high) Canny pair and Hough vote threshold."""
+    if presets is None:
+        presets = PRESETS
+
+    candidates = {}
+    for (name, preset), (low, high), threshold in itertools.product(presets.items(), canny_thresholds,
+                                                                     hough_thresholds):
+        config = dict(preset, canny_low_threshold=low, canny_high_threshold=high)
+        config['hough_transform_pipeline'] = dict(preset['hough_transform_pipeline'], threshold=threshold)
+        candidates['%s_canny%d-%d_hough%d' % (name, low, high, threshold)] = config
+    return candidates
+
+
+def vanishing_points(lanes):
+    """Intersection of the left and right lane of every frame of a (frames, 2, 4) track, NaN where either is missing."""
+    m, b = lines_from_track(lanes)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (b[:, 1] - b[:, 0]) / (m[:, 0] - m[:, 1])
+    return np.column_stack((x, m[:, 0] * x + b[:, 0]))
+
+
+def score_candidate(config, frames_path):
+    """Runs `config` on every frame in `frames_path` independently. Runs inside a worker."""
+    frames = np.load(frames_path, mmap_mode='r')
+    pipeline_context = create_pipeline_context(config)
+    initial_state = pipeline_context.get_state()
+
+    lanes = np.full((len(frames), 2, 4), np.nan)
+    for i, frame in enumerate(frames):
+        pipeline_context.set_state(initial_state)
+        pipeline_context.current_frame += 1
+
+        frame = np.asarray(frame)
+        masked_edges = pipeline_context.find_edges(frame)
+        lines = pipeline_context.detect_lines(masked_edges, frame.shape)
+        pipeline_context.draw_lines(np.zeros_like(frame), lines)
+
+        if pipeline_context.left_lane is not None:
+            lanes[i, 0] = pipeline_context.left_lane
+        if pipeline_context.right_lane is not None:
+            lanes[i, 1] = pipeline_context.right_lane
+
+    points = vanishing_points(lanes)
+    found = ~np.isnan(points).any(axis=1)
+    # median absolute deviation so a single odd frame doesn't sink a good candidate
+    spread = np.inf
+    if found.sum() >= 2:
+        spread = float(np.hypot(*np.median(np.abs(points[found] - np.median(points[found], axis=0)), axis=0)))
+
+    return {'both_lanes': int(found.sum()), 'frames': len(frames), 'vanishing_point_spread_px': spread}
+
+
+def calibrate(src_video_path, candidates=None, n_samples=30, executor=None, work_dir=None):
+    """
+    Returns (config, results): the best candidate's configuration, ready for
+    create_pipeline_context(config), and every candidate's score, best first.
+
+    Candidates finding both lanes in the most sampled frames win, ties go to the one with
+    the steadiest vanishing point.
+    """
+    from lanelines.video import sample_frames
+
+    if candidates is None:
+        candidates = candidate_grid()
+
+    owns_work_dir = work_dir is None
+    if owns_work_dir:
+        work_dir = tempfile.mkdtemp(prefix='lanelines_calibration_')
+
+    owns_executor = executor is None
+    if owns_executor:
+        executor = concurrent.futures.ProcessPoolExecutor()
+
+    try:
+        frames_path = os.path.join(work_dir, 'frames.npy')
+        np.save(frames_path, np.array(sample_frames(src_video_path, n_samples)))
+
+        futures = {name: executor.submit(score_candidate, config, frames_path) for name, config in candidates.items()}
+        results = [dict(futures[name].result(), name=name) for name in candidates]
+    finally:
+        if owns_executor:
+            executor.shutdown()
+        if owns_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results.sort(key=lambda result: (-result['both_lanes'], result['vanishing_point_spread_px']))
+    return candidates[results[0]['name']], results
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+
+
+class CameraUndistorter:
+    """
+    Removes lens distortion with rectification maps that are built once and reused.
+
+    cv2.undistort recomputes its maps on every call. Here they're built with
+    cv2.initUndistortRectifyMap the first time a frame size is seen, cached in memory,
+    and also saved to `cache_dir` keyed by camera name, resolution and a hash of the
+    intrinsics. A new process for the same camera loads them instead of rebuilding.
+    Each frame then costs one cv2.remap.
+
+    `intrinsics_path` is a JSON or .npz file with `camera_matrix`, `dist_coeffs` and
+    optionally `camera` (a name) and `image_size` ((width, height) the calibration was
+    done at; the camera matrix is rescaled for other resolutions).
+
+    `roi_rows` is an optional (top, bottom) pair of fractions of the frame height. When
+    given, only those rows are remapped and the rest of the frame is left as is, which is
+    enough when only the road region is analysed.
+    """
+
+    def __init__(self, intrinsics_path, cache_dir=None, roi_rows=None):
+        if intrinsics_path.endswith('.npz'):
+            with np.load(intrinsics_path) as intrinsics:
+                intrinsics = {name: intrinsics[name].tolist() for name in intrinsics.files}
+        else:
+            with open(intrinsics_path) as intrinsics_file:
+                intrinsics = json.load(intrinsics_file)
+
+        self.camera_matrix = np.array(intrinsics['camera_matrix'], dtype=np.float64)
+        self.dist_coeffs = np.array(intrinsics['dist_coeffs'], dtype=np.float64).ravel()
+        self.image_size = intrinsics.get('image_size')
+        self.camera = str(intrinsics.get('camera', os.path.splitext(os.path.basename(intrinsics_path))[0]))
+
+        self.cache_dir = cache_dir
+        self.roi_rows = roi_rows
+
+        digest = hashlib.sha1(self.camera_matrix.tobytes() + self.dist_coeffs.tobytes()).hexdigest()[:10]
+        self.cache_key = '%s_%s' % (self.camera, digest)
+
+        # (height, width) -> (map1, map2)
+        self.cache = {}
+
+    def scaled_camera_matrix(self, width, height):
+        if self.image_size is None:
+            return self.camera_matrix
+
+        scale = np.array([[width / float(self.image_size[0])], [height / float(self.image_size[1])], [1.]])
+        return self.camera_matrix * scale
+
+    def maps(self, frame_shape):
+        key = tuple(frame_shape[:2])
+        if key in self.cache:
+            return self.cache[key]
+
+        height, width = key
+        cache_path = None
+        if self.cache_dir is not None:
+            cache_path = os.path.join(self.cache_dir, '%s_%dx%d.npz' % (self.cache_key, width, height))
+
+        if cache_path is not None and os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                maps = (cached['map1'], cached['map2'])
+        else:
+            camera_matrix = self.scaled_camera_matrix(width, height)
+            maps = cv2.initUndistortRectifyMap(camera_matrix, self.dist_coeffs, None, camera_matrix,
+                                               (width, height), cv2.CV_16SC2)
+
+            if cache_path is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = cache_path + '.tmp.npz'
+                np.savez(tmp_path, map1=maps[0], map2=maps[1])
+                os.replace(tmp_path, cache_path)
+
+        if self.roi_rows is not None:
+            top = int(height * self.roi_rows[0])
+            bottom = int(height * self.roi_rows[1])
+            maps = (maps[0][top:bottom], maps[1][top:bottom])
+
+        self.cache[key] = maps
+        return maps
+
+    def undistort(self, image):
+        map1, map2 = self.maps(image.shape)
+
+        if self.roi_rows is None:
+            return cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
+
+        top = int(image.shape[0] * self.roi_rows[0])
+        undistorted = image.copy()
+        undistorted[top:top + len(map1)] = cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
+        return undistorted
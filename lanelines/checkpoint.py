@@ -0,0 +1,88 @@
+"""
+Resumable video processing.
+
+moviepy's write_videofile can't append to a file it didn't finish, so the output is
+encoded as a series of parts instead. Every checkpoint_interval frames the current part is
+closed and a checkpoint is written. The checkpoint holds the next frame index, the number
+of finished parts (the offset into the encoded output) and PipelineContext.get_state().
+A restarted job loads the checkpoint and seeks the source to that frame. It then keeps
+appending parts and finally joins them into the destination without re-encoding.
+"""
+import glob
+import os
+import shutil
+
+import numpy as np
+
+from lanelines.video import VideoWriter, concatenate_videos, iter_frames, video_info
+
+
+def save_checkpoint(path, frame_index, parts, pipeline_context):
+    # write next to the real file and rename so a crash mid-write never corrupts the last good checkpoint
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, frame_index=frame_index, parts=parts, **pipeline_context.get_state())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, pipeline_context):
+    """Restores `pipeline_context` from `path` and returns (frame index, finished parts)."""
+    with np.load(path) as checkpoint:
+        state = {name: checkpoint[name] for name in checkpoint.files}
+
+    pipeline_context.set_state(state)
+    return int(state['frame_index']), int(state['parts'])
+
+
+def process_video_resumable(pipeline_context, src_video_path, dst_video_path, checkpoint_interval=1000,
+                            checkpoint_path=None):
+    """
+    Like PipelineContext.process_video but picks up from the last checkpoint if a previous
+    run of the same job died. Returns the number of frames processed by this call.
+    """
+    if checkpoint_path is None:
+        checkpoint_path = dst_video_path + '.checkpoint.npz'
+    parts_dir = dst_video_path + '.parts'
+
+    frame_index = 0
+    parts = 0
+    if os.path.exists(checkpoint_path):
+        frame_index, parts = load_checkpoint(checkpoint_path, pipeline_context)
+    else:
+        pipeline_context.current_frame = 0
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    os.makedirs(parts_dir, exist_ok=True)
+    # a part that was being written when the job died is incomplete, it gets redone
+    for path in sorted(glob.glob(os.path.join(parts_dir, '*.mp4')))[parts:]:
+        os.remove(path)
+
+    fps, duration, n_frames, size = video_info(src_video_path)
+
+    def part_path(part):
+        return os.path.join(parts_dir, 'part_%06d.mp4' % part)
+
+    processed = 0
+    writer = VideoWriter(part_path(parts), size, fps)
+    try:
+        for frame in iter_frames(src_video_path, frame_index / fps):
+            writer.write(pipeline_context.process_image(frame))
+            frame_index += 1
+            processed += 1
+
+            if writer.frames_written >= checkpoint_interval:
+                writer.close()
+                parts += 1
+                save_checkpoint(checkpoint_path, frame_index, parts, pipeline_context)
+                writer = VideoWriter(part_path(parts), size, fps)
+    finally:
+        writer.close()
+
+    if writer.frames_written > 0:
+        parts += 1
+
+    concatenate_videos([part_path(part) for part in range(parts)], dst_video_path)
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    return processed
@@ -0,0 +1,107 @@
+"""
+Processes one video as several independent chunks.
+
+The EMA/Kalman state in PipelineContext carries from frame to frame, so a chunk can't just
+start cold at its first frame. Each chunk is pre-rolled over the frames right before it
+(warmup_frames, ema_fps_period worth by default) with their output discarded. The
+smoothing state is then about the same as it would have been in a sequential run when the
+chunk's first real frame arrives.
+
+Chunks are split on keyframes, and every chunk is encoded with the same settings. That
+means the outputs can be joined with ffmpeg's concat demuxer without re-encoding.
+Any concurrent.futures.Executor can run the chunks. A ProcessPoolExecutor is used by
+default; an executor backed by a cluster spreads them across machines as long as
+`work_dir` is on storage every node can reach.
+"""
+import bisect
+import concurrent.futures
+import math
+import os
+import shutil
+import tempfile
+
+from lanelines.presets import create_pipeline_context
+from lanelines.video import VideoWriter, concatenate_videos, iter_frames, keyframe_times, video_info
+
+
+def plan_chunks(src_video_path, n_chunks):
+    """Returns up to `n_chunks` (start_time, end_time) ranges that begin on keyframes and cover the whole video."""
+    fps, duration, n_frames, size = video_info(src_video_path)
+    keyframes = sorted(keyframe_times(src_video_path)) or [0.]
+
+    starts = [0.]
+    for i in range(1, n_chunks):
+        target = duration * i / n_chunks
+        # closest keyframe to an even split
+        index = bisect.bisect_left(keyframes, target)
+        candidates = keyframes[max(0, index - 1):index + 1]
+        start = min(candidates, key=lambda time: abs(time - target))
+        if start > starts[-1]:
+            starts.append(start)
+
+    ends = starts[1:] + [None]
+    return list(zip(starts, ends))
+
+
+def process_chunk(src_video_path, dst_video_path, start_time, end_time, preset, overrides, warmup_frames):
+    """Processes frames [start_time, end_time) of the source into `dst_video_path`. Runs inside a worker."""
+    pipeline_context = create_pipeline_context(preset, **overrides)
+    fps, duration, n_frames, size = video_info(src_video_path)
+
+    warmup_start = max(0., start_time - warmup_frames / fps)
+    warmup_frames = int(round((start_time - warmup_start) * fps))
+
+    # keep frame numbers in the event log relative to the whole video
+    pipeline_context.current_frame = int(round(warmup_start * fps))
+
+    # subclip() is inclusive of end_time so stop one frame short of the next chunk
+    if end_time is not None:
+        end_time -= 0.5 / fps
+
+    with VideoWriter(dst_video_path, size, fps) as writer:
+        for i, frame in enumerate(iter_frames(src_video_path, warmup_start, end_time)):
+            result = pipeline_context.process_image(frame)
+            if i >= warmup_frames:
+                writer.write(result)
+        frames_written = writer.frames_written
+
+    return frames_written, pipeline_context.event_log.close()
+
+
+def process_video_chunked(src_video_path, dst_video_path, preset, n_chunks=None, executor=None,
+                          warmup_frames=None, work_dir=None, **overrides):
+    """
+    Chunked equivalent of create_pipeline_context(preset, **overrides).process_video(src, dst).
+
+    Returns the per-chunk (frames written, event log summary) tuples.
+    """
+    if n_chunks is None:
+        n_chunks = os.cpu_count() or 1
+
+    if warmup_frames is None:
+        warmup_frames = int(math.ceil(create_pipeline_context(preset, **overrides).ema_fps_period))
+
+    chunks = plan_chunks(src_video_path, n_chunks)
+
+    owns_work_dir = work_dir is None
+    if owns_work_dir:
+        work_dir = tempfile.mkdtemp(prefix='lanelines_chunks_')
+
+    owns_executor = executor is None
+    if owns_executor:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=n_chunks)
+
+    try:
+        chunk_paths = [os.path.join(work_dir, 'chunk_%04d.mp4' % i) for i in range(len(chunks))]
+        futures = [executor.submit(process_chunk, src_video_path, chunk_path, start_time, end_time, preset,
+                                   overrides, warmup_frames)
+                   for chunk_path, (start_time, end_time) in zip(chunk_paths, chunks)]
+        results = [future.result() for future in futures]
+
+        concatenate_videos(chunk_paths, dst_video_path)
+        return results
+    finally:
+        if owns_executor:
+            executor.shutdown()
+        if owns_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,3 @@
+# This constant ultimately contributes to deriving a given
+# period when computing SMA and EMA for line noise smoothing
+FPS = 30
@@ -0,0 +1,197 @@
+"""
+Accuracy versus speed against hand labelled lanes.
+
+Annotations are a JSON file:
+
+    {"annotations": [
+        {"source": "test_images/solidWhiteRight.jpg", "left": [x1, y1, x2, y2], "right": [x1, y1, x2, y2]},
+        {"source": "solidWhiteRight.mp4", "frame": 120, "left": [x1, y1, x2, y2], "right": null}
+    ]}
+
+`source` is an image or a video (relative to the annotation file), `frame` the 0 based
+index of a video frame as iter_frames yields them. `left` and `right` are the visible
+extent of each painted lane line in pixels, null when that lane isn't visible. An entry
+missing either key hasn't been labelled yet (see annotation_template) and is refused.
+
+evaluate runs a PipelineContext configuration over every annotated image (each with a
+fresh context, so nothing carries over from the previous image) and through every
+annotated video up to its last labelled frame, and measures endpoint error, missed and
+spurious lanes and frames per second together. pareto_table lines several of those up.
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def parse_lane(lane):
+    if lane is None:
+        return None
+    lane = np.asarray(lane, dtype=np.float64)
+    if lane.shape != (4,):
+        raise ValueError('a lane is [x1, y1, x2, y2], got %r' % (lane.tolist(),))
+    return lane
+
+
+def load_annotations(path):
+    """Returns the annotations of `path` with absolute sources and lanes as float arrays or None."""
+    with open(path) as annotation_file:
+        document = json.load(annotation_file)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    annotations = []
+    for entry in document['annotations']:
+        if 'left' not in entry or 'right' not in entry:
+            raise ValueError('%s frame %s is not labelled' % (entry['source'], entry.get('frame')))
+
+        annotations.append({
+            'source': os.path.join(directory, entry['source']),
+            'frame': entry.get('frame'),
+            'left': parse_lane(entry['left']),
+            'right': parse_lane(entry['right'])
+        })
+
+    return annotations
+
+
+def annotation_template(sources, frames=(), path=None):
+    """
+    Unlabelled entries for every image in `sources` and every (video, frame) in `frames`,
+    to be filled in by hand. Written to `path` as JSON when given.
+    """
+    entries = [{'source': source} for source in sources]
+    entries += [{'source': source, 'frame': int(frame)} for source, frame in frames]
+    document = {'annotations': entries}
+
+    if path is not None:
+        with open(path, 'w') as annotation_file:
+            json.dump(document, annotation_file, indent=2)
+
+    return document
+
+
+def lane_error(predicted, truth):
+    """
+    Mean horizontal distance in pixels between a predicted lane and a labelled one.
+
+    The predicted line is evaluated at the two rows the label ends on, so lanes that were
+    drawn shorter or longer than the paint don't count against it, only where they are.
+    """
+    x1, y1, x2, y2 = predicted
+    if y1 == y2:
+        return np.inf
+
+    rows = truth[[1, 3]]
+    predicted_x = x1 + (rows - y1) * (x2 - x1) / (y2 - y1)
+    return float(np.mean(np.abs(predicted_x - truth[[0, 2]])))
+
+
+def create_context(config):
+    """`config` is a preset (name or dict, see create_pipeline_context) or a callable returning a PipelineContext."""
+    if callable(config):
+        return config()
+
+    from lanelines.presets import create_pipeline_context
+    return create_pipeline_context(config)
+
+
+def evaluate(config, annotations):
+    """
+    Runs `config` over `annotations` (see load_annotations).
+
+    Returns endpoint_error_px (mean over lanes both labelled and drawn), missed (labelled but
+    not drawn), spurious (drawn where the label says there's no lane), frames and fps. fps
+    only counts the time spent in process_image, not decoding.
+    """
+    from lanelines.sources import decode_image
+    from lanelines.video import iter_frames
+
+    predictions = [None] * len(annotations)
+    elapsed = 0.
+    frames = 0
+
+    def run(pipeline_context, frame):
+        start = time.perf_counter()
+        pipeline_context.process_image(frame)
+        return time.perf_counter() - start, (pipeline_context.left_lane, pipeline_context.right_lane)
+
+    videos = {}
+    for i, annotation in enumerate(annotations):
+        if annotation['source'].lower().endswith(VIDEO_EXTENSIONS):
+            videos.setdefault(annotation['source'], {})[annotation['frame']] = i
+            continue
+
+        seconds, predictions[i] = run(create_context(config), decode_image(annotation['source']))
+        elapsed += seconds
+        frames += 1
+
+    for source, labelled in videos.items():
+        pipeline_context = create_context(config)
+        last_frame = max(labelled)
+        for frame_index, frame in enumerate(iter_frames(source)):
+            seconds, lanes = run(pipeline_context, frame)
+            elapsed += seconds
+            frames += 1
+            if frame_index in labelled:
+                predictions[labelled[frame_index]] = lanes
+            if frame_index >= last_frame:
+                break
+
+    errors = []
+    missed = 0
+    spurious = 0
+    for annotation, predicted in zip(annotations, predictions):
+        for side, lane in enumerate(predicted if predicted is not None else (None, None)):
+            truth = annotation[('left', 'right')[side]]
+            if truth is None:
+                spurious += lane is not None
+            elif lane is None:
+                missed += 1
+            else:
+                errors.append(lane_error(lane, truth))
+
+    return {
+        'endpoint_error_px': float(np.mean(errors)) if errors else np.nan,
+        'missed': missed,
+        'spurious': spurious,
+        'frames': frames,
+        'fps': frames / elapsed if elapsed > 0 else np.nan
+    }
+
+
+def pareto_table(configs, annotations):
+    """
+    Evaluates every {name: config} and returns their results sorted fastest first.
+
+    A configuration is on the Pareto front ('pareto': True) unless another one is at least
+    as fast, at least as accurate and misses no more lanes, and strictly better in one of those.
+    """
+    rows = [dict(evaluate(config, annotations), name=name) for name, config in configs.items()]
+
+    for row in rows:
+        row['pareto'] = not any(
+            other['fps'] >= row['fps'] and other['endpoint_error_px'] <= row['endpoint_error_px'] and
+            other['missed'] <= row['missed'] and
+            (other['fps'] > row['fps'] or other['endpoint_error_px'] < row['endpoint_error_px'] or
+             other['missed'] < row['missed'])
+            for other in rows if other is not row)
+
+    return sorted(rows, key=lambda row: -row['fps'])
+
+
+def format_table(rows):
+    lines = ['%-24s %8s %10s %7s %9s %7s' % ('config', 'fps', 'error px', 'missed', 'spurious', 'pareto')]
+    for row in rows:
+        lines.append('%-24s %8.1f %10.2f %7d %9d %7s' % (row['name'], row['fps'], row['endpoint_error_px'],
+                                                         row['missed'], row['spurious'],
+                                                         '*' if row['pareto'] else ''))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    # python -m lanelines.evaluation annotations.json white yellow challenge
+    print(format_table(pareto_table({name: name for name in sys.argv[2:]}, load_annotations(sys.argv[1]))))
@@ -0,0 +1,112 @@
+import collections
+import json
+import queue
+import threading
+import time
+
+from lanelines.constants import FPS
+
+
+class PipelineEventLog:
+    """
+    Structured replacement for printing from inside the frame loop.
+
+    Every event is counted, but only the first max_events_per_window events of each
+    kind within window_frames frames are kept as samples so a bad stretch of road
+    can't flood the output. Numeric observations (segment counts, fit residuals)
+    are aggregated into count/sum/min/max. Sampled events are handed to a background
+    thread which appends them as JSON lines to `path`, so the hot loop never waits
+    on I/O. close() flushes the writer and returns the run summary.
+    """
+
+    def __init__(self, path=None, window_frames=FPS, max_events_per_window=1, flush_interval=1.):
+        self.path = path
+        self.window_frames = window_frames
+        self.max_events_per_window = max_events_per_window
+        self.flush_interval = flush_interval
+
+        self.counters = collections.Counter()
+        self.suppressed = collections.Counter()
+        self.observations = {}
+
+        # kind -> (window index, events sampled in that window)
+        self.windows = {}
+
+        self.queue = queue.Queue()
+        self.writer = None
+
+    def record(self, kind, frame, **fields):
+        self.counters[kind] += 1
+
+        window = frame // self.window_frames
+        current_window, sampled = self.windows.get(kind, (window, 0))
+        if current_window != window:
+            sampled = 0
+
+        if sampled >= self.max_events_per_window:
+            self.suppressed[kind] += 1
+            return
+
+        self.windows[kind] = (window, sampled + 1)
+
+        if self.path is not None:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self.write_events, daemon=True)
+                self.writer.start()
+
+            fields.update(kind=kind, frame=frame)
+            self.queue.put(fields)
+
+    def count(self, kind):
+        """Counts an event that is too frequent to be worth sampling (a decision made every frame, say)."""
+        self.counters[kind] += 1
+
+    def observe(self, name, value):
+        count, total, minimum, maximum = self.observations.get(name, (0, 0., value, value))
+        self.observations[name] = (count + 1, total + value, min(minimum, value), max(maximum, value))
+
+    def write_events(self):
+        with open(self.path, 'a') as log_file:
+            while True:
+                events = [self.queue.get()]
+
+                # drain whatever else piled up so we write in batches
+                try:
+                    while True:
+                        events.append(self.queue.get_nowait())
+                except queue.Empty:
+                    pass
+
+                for event in events:
+                    if event is None:
+                        return
+                    log_file.write(json.dumps(event) + '\n')
+
+                log_file.flush()
+                time.sleep(self.flush_interval)
+
+    def summary(self):
+        observations = {}
+        for name, (count, total, minimum, maximum) in self.observations.items():
+            observations[name] = {'count': count, 'mean': total / count, 'min': minimum, 'max': maximum}
+
+        return {
+            'counters': dict(self.counters),
+            'suppressed_events': dict(self.suppressed),
+            'observations': observations
+        }
+
+    def close(self):
+        """Flushes pending events, appends the summary to `path` and returns it."""
+        summary = self.summary()
+
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+
+        if self.path is not None:
+            with open(self.path, 'a') as log_file:
+                log_file.write(json.dumps({'kind': 'summary', 'summary': summary}) + '\n')
+
+        return summary
@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class SlidingWindowDetector:
+    """
+    Finds lane lines by scanning a column histogram instead of voting in Hough space.
+
+    The bottom half of the region of interest is summed column-wise. The strongest column
+    left of the image center and the strongest one right of it are taken as the lane bases.
+    From each base a stack of n_windows windows walks up the region. Each window keeps the
+    pixels within `margin` of its center and recenters on them when there are at least
+    `min_pixels`. Windows without enough pixels (gaps in dashed lines) are skipped while
+    the search keeps following the lane's sideways drift with a growing margin. The
+    centroids of consecutive windows are returned as line segments in the HoughLinesP
+    (N, 1, 4) layout. That way draw_lines classifies, fits, smooths and draws them
+    exactly like Hough output, for both the linear and quadratic lane models.
+    """
+
+    def __init__(self, n_windows=9, margin=40, min_pixels=20):
+        self.n_windows = n_windows
+        self.margin = margin
+        self.min_pixels = min_pixels
+
+    def find_lines(self, img, vertices):
+        """`img` is a binary (e.g. masked Canny) image, `vertices` the region polygon from PipelineContext."""
+        y_top = vertices[0][:, 1].min()
+        y_bottom = vertices[0][:, 1].max()
+        window_height = max(1, int(np.ceil((y_bottom - y_top) / float(self.n_windows))))
+
+        ys, xs = np.nonzero(img[y_top:y_bottom])
+        if len(xs) == 0:
+            return None
+        ys = ys + y_top
+
+        midpoint = img.shape[1] // 2
+        histogram = np.bincount(xs[ys >= (y_top + y_bottom) // 2], minlength=img.shape[1])
+
+        # group pixels by window once so each window is a contiguous slice
+        windows = (y_bottom - 1 - ys) // window_height
+        order = np.argsort(windows, kind='mergesort')
+        xs = xs[order]
+        ys = ys[order]
+        bounds = np.searchsorted(windows[order], np.arange(self.n_windows + 1))
+
+        segments = []
+        for base in (np.argmax(histogram[:midpoint]), midpoint + np.argmax(histogram[midpoint:])):
+            if histogram[base] == 0:
+                continue
+
+            center = base
+            shift = 0  # how far the lane moved sideways per window so far
+            misses = 0
+            centroids = []
+            for window in range(self.n_windows):
+                # dashed lines leave windows empty, keep walking along the lane's direction
+                # and widen the search until we find it again
+                predicted = center + shift * (misses + 1)
+                window_xs = xs[bounds[window]:bounds[window + 1]]
+                inside = np.abs(window_xs - predicted) < self.margin * (misses + 1)
+                if np.count_nonzero(inside) < self.min_pixels:
+                    misses += 1
+                    continue
+
+                found = int(window_xs[inside].mean())
+                if len(centroids) > 0:
+                    shift = (found - center) / float(misses + 1)
+                center = found
+                misses = 0
+                centroids.append((center, int(ys[bounds[window]:bounds[window + 1]][inside].mean())))
+
+            for (x1, y1), (x2, y2) in zip(centroids, centroids[1:]):
+                # left to right like HoughLinesP so draw_lines' angle windows apply
+                segments.append((x1, y1, x2, y2) if x1 <= x2 else (x2, y2, x1, y1))
+
+        if len(segments) == 0:
+            return None
+
+        return np.array(segments, dtype=np.int32).reshape((-1, 1, 4))
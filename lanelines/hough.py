@@ -0,0 +1,345 @@
+import cv2
+import numpy as np
+
+
+class BandedHoughTransform:
+    """
+    Probabilistic-style Hough transform in NumPy that only votes over the line angles we keep.
+
+    draw_lines throws away every segment outside of its left/right angle windows so there
+    is no point voting for the other ~130 of 180 angles cv2.HoughLinesP considers.
+    `angle_bands` are segment angles in degrees (as computed in draw_lines) which map to
+    Hough normal angles theta = angle + 90. The sin/cos tables for those thetas are
+    computed once. Votes for all masked edge pixels are accumulated with a single
+    bincount. Like cv2.HoughLinesP, the strongest cell is taken, its pixels are split into
+    segments wherever they are more than max_line_gap apart, and those pixels' votes are
+    taken back out of the accumulator before looking for the next peak. That way a lane
+    line yields one peak instead of a cluster of near-duplicates, and the search stops
+    once no cell has `threshold` votes left or `max_lines` segments were found.
+    """
+
+    def __init__(self, angle_bands, theta, max_lines=50):
+        self.max_lines = max_lines
+
+        thetas = []
+        for low, high in angle_bands:
+            thetas.append(np.arange(np.deg2rad(low + 90), np.deg2rad(high + 90) + theta / 2, theta))
+        self.thetas = np.concatenate(thetas)
+        self.cos = np.cos(self.thetas).astype(np.float32)
+        self.sin = np.sin(self.thetas).astype(np.float32)
+
+    def find_lines(self, img, rho, threshold, min_line_length, max_line_gap):
+        """Returns segments in the same (N, 1, 4) layout as cv2.HoughLinesP, or None."""
+        ys, xs = np.nonzero(img)
+        if len(xs) == 0:
+            return None
+
+        xs = xs.astype(np.float32)
+        ys = ys.astype(np.float32)
+
+        n_thetas = len(self.thetas)
+        max_rho = np.hypot(img.shape[0], img.shape[1])
+        n_rhos = int(np.ceil(2 * max_rho / rho)) + 1
+
+        # (pixels, thetas) distances and their accumulator cells
+        rhos = np.outer(xs, self.cos) + np.outer(ys, self.sin)
+        rho_bins = np.rint((rhos + max_rho) / rho).astype(np.int32)
+        cells = rho_bins * n_thetas + np.arange(n_thetas, dtype=np.int32)
+
+        accumulator = np.bincount(cells.ravel(), minlength=n_rhos * n_thetas)
+
+        segments = []
+        while len(segments) < self.max_lines:
+            peak = np.argmax(accumulator)
+            if accumulator[peak] < threshold:
+                break
+            rho_bin, t = divmod(peak, n_thetas)
+
+            # every pixel within a bin of the peak's line belongs to it, whether or not it ends up in a
+            # long enough segment, and no longer votes for anything else
+            line_rho = rho_bin * rho - max_rho
+            on_line = np.abs(rho_bins[:, t] - rho_bin) <= 1
+            accumulator -= np.bincount(cells[on_line].ravel(), minlength=n_rhos * n_thetas)
+            accumulator[peak] = 0
+            rho_bins[on_line] = -n_rhos
+
+            # position of each supporting pixel along the line direction
+            positions = np.sort(ys[on_line] * self.cos[t] - xs[on_line] * self.sin[t])
+            breaks = np.flatnonzero(np.diff(positions) > max_line_gap)
+            starts = positions[np.concatenate(([0], breaks + 1))]
+            ends = positions[np.concatenate((breaks, [len(positions) - 1]))]
+            keep = (ends - starts) >= min_line_length
+
+            for start, end in zip(starts[keep], ends[keep]):
+                x1, y1 = line_rho * self.cos[t] - start * self.sin[t], line_rho * self.sin[t] + start * self.cos[t]
+                x2, y2 = line_rho * self.cos[t] - end * self.sin[t], line_rho * self.sin[t] + end * self.cos[t]
+                if x1 > x2:
+                    x1, y1, x2, y2 = x2, y2, x1, y1
+                segments.append((x1, y1, x2, y2))
+
+        if len(segments) == 0:
+            return None
+
+        return np.rint(segments).astype(np.int32).reshape((-1, 1, 4))
+
+
+class PyramidHoughTransform:
+    """
+    Two level, coarse to fine Hough search.
+
+    The edge map is max pooled by `scale` and a standard Hough transform on that small
+    image, restricted to the normal angles of each of `angle_bands` (the windows
+    draw_lines keeps), finds the `candidates_per_band` strongest lines per band.
+    cv2.HoughLinesP then only sees the full resolution edge pixels within `strip_width`
+    pixels of a candidate, so the fine search no longer pays for road texture, shadows
+    and other clutter away from the lanes.
+    """
+
+    def __init__(self, angle_bands, theta, scale=4, strip_width=16, coarse_threshold=None, candidates_per_band=3):
+        # segment angle a (as draw_lines computes it) is the Hough normal angle a + 90
+        self.theta_bands = [(np.deg2rad(low + 90), np.deg2rad(high + 90)) for low, high in angle_bands]
+        self.coarse_theta = theta * 2
+        self.scale = scale
+        self.strip_width = strip_width
+        self.coarse_threshold = coarse_threshold
+        self.candidates_per_band = candidates_per_band
+        self.pool_kernel = np.ones((scale, scale), np.uint8)
+
+    def pool(self, img):
+        # max over every scale x scale block: dilate towards the block's top left pixel, then pick it
+        height, width = img.shape[:2]
+        dilated = cv2.dilate(img, self.pool_kernel, anchor=(0, 0))
+        return cv2.resize(dilated, (width // self.scale, height // self.scale), interpolation=cv2.INTER_NEAREST)
+
+    def candidates(self, img, threshold):
+        """Returns the (rho, theta) of the strongest candidate lines in full resolution pixels."""
+        coarse = self.pool(img)
+
+        coarse_threshold = self.coarse_threshold
+        if coarse_threshold is None:
+            coarse_threshold = max(2, threshold // self.scale)
+
+        candidates = []
+        for min_theta, max_theta in self.theta_bands:
+            lines = cv2.HoughLines(coarse, 1, self.coarse_theta, coarse_threshold, min_theta=min_theta,
+                                   max_theta=max_theta)
+            # HoughLines returns the lines sorted by votes
+            if lines is not None:
+                candidates.append(lines.reshape((-1, 2))[:self.candidates_per_band])
+
+        if len(candidates) == 0:
+            return np.empty((0, 2), dtype=np.float32)
+
+        candidates = np.concatenate(candidates)
+        # pooled pixel (x, y) came from the block whose top left pixel is scale * (x, y)
+        candidates[:, 0] *= self.scale
+        return candidates
+
+    def strip_mask(self, img, candidates):
+        """Full resolution mask of the strips around `candidates`, drawn at the coarse level and scaled up."""
+        height, width = img.shape[:2]
+        coarse_height, coarse_width = -(-height // self.scale), -(-width // self.scale)
+        coarse_mask = np.zeros((coarse_height, coarse_width), dtype=np.uint8)
+
+        reach = coarse_height + coarse_width
+        for rho, theta in candidates:
+            cos, sin = np.cos(theta), np.sin(theta)
+            x0, y0 = rho * cos / self.scale, rho * sin / self.scale
+            start = (int(round(x0 - reach * sin)), int(round(y0 + reach * cos)))
+            end = (int(round(x0 + reach * sin)), int(round(y0 - reach * cos)))
+            cv2.line(coarse_mask, start, end, 255, 2 * (self.strip_width // self.scale) + 1)
+
+        mask = cv2.resize(coarse_mask, (coarse_width * self.scale, coarse_height * self.scale),
+                          interpolation=cv2.INTER_NEAREST)
+        return mask[:height, :width]
+
+    def find_lines(self, img, rho, theta, threshold, min_line_length, max_line_gap):
+        """Returns segments in the same (N, 1, 4) layout as cv2.HoughLinesP, or None."""
+        candidates = self.candidates(img, threshold)
+        if len(candidates) == 0:
+            return None
+
+        strips = cv2.bitwise_and(img, self.strip_mask(img, candidates))
+
+        # HoughLinesP has a cost per image pixel on top of the one per edge pixel so only
+        # hand it the part of the frame the strips' edges cover
+        x, y, width, height = cv2.boundingRect(strips)
+        if width == 0 or height == 0:
+            return None
+
+        lines = cv2.HoughLinesP(strips[y:y + height, x:x + width], rho, theta, threshold, np.array([]),
+                                minLineLength=min_line_length, maxLineGap=max_line_gap)
+        if lines is None:
+            return None
+
+        return lines + np.array([x, y, x, y], dtype=lines.dtype)
+
+
+def merge_collinear_segments(lines, reference_y, angle_bin=2., intercept_bin=10.):
+    """
+    Collapses nearly identical segments into one length weighted segment per cluster.
+
+    Segments are clustered by their angle (in `angle_bin` degree bins) and by the x where
+    their line crosses row `reference_y` (in `intercept_bin` pixel bins). Each cluster is
+    replaced by a segment with the cluster's length weighted mean angle and crossing,
+    spanning the extent of all of its members. Horizontal segments are dropped since
+    draw_lines ignores them anyway. Returns an (N, 1, 4) int32 array or None.
+    """
+    if lines is None or len(lines) == 0:
+        return lines
+
+    segments = np.asarray(lines, dtype=np.float64).reshape((-1, 4))
+    segments = segments[segments[:, 1] != segments[:, 3]]
+    if len(segments) == 0:
+        return None
+
+    # point every segment left to right so angles fall in [-90, 90]
+    reverse = segments[:, 2] < segments[:, 0]
+    segments[reverse] = segments[reverse][:, [2, 3, 0, 1]]
+
+    x1, y1, x2, y2 = segments.T
+    dx = x2 - x1
+    dy = y2 - y1
+    lengths = np.hypot(dx, dy)
+    angles = np.arctan2(dy, dx)
+    crossings = x1 + (reference_y - y1) * dx / dy
+
+    keys = np.column_stack((np.floor(np.degrees(angles) / angle_bin), np.floor(crossings / intercept_bin)))
+    clusters = np.unique(keys, axis=0, return_inverse=True)[1].ravel()
+    n_clusters = clusters.max() + 1
+
+    total_length = np.bincount(clusters, lengths, n_clusters)
+    angle = np.bincount(clusters, lengths * angles, n_clusters) / total_length
+    crossing = np.bincount(clusters, lengths * crossings, n_clusters) / total_length
+    cos = np.cos(angle)
+    sin = np.sin(angle)
+
+    # extent of every member along its cluster's direction, measured from the crossing point
+    positions = np.concatenate(((x1 - crossing[clusters]) * cos[clusters] + (y1 - reference_y) * sin[clusters],
+                                (x2 - crossing[clusters]) * cos[clusters] + (y2 - reference_y) * sin[clusters]))
+    both_clusters = np.concatenate((clusters, clusters))
+    start = np.full(n_clusters, np.inf)
+    end = np.full(n_clusters, -np.inf)
+    np.minimum.at(start, both_clusters, positions)
+    np.maximum.at(end, both_clusters, positions)
+
+    merged = np.column_stack((crossing + start * cos, reference_y + start * sin,
+                              crossing + end * cos, reference_y + end * sin))
+    return np.rint(merged).astype(np.int32).reshape((-1, 1, 4))
+
+
+class HoughTransformPipeline:
+    def __init__(self, rho=1, theta=np.pi / 180, threshold=1, min_line_length=10, max_line_gap=1,
+                 backend='opencv', angle_bands=((-50, -25), (20, 45)), mode='single', pyramid_scale=4,
+                 strip_width=16, max_lines=50):
+        self.rho = rho
+        self.theta = theta
+        self.threshold = threshold
+        self.min_line_length = min_line_length
+        self.max_line_gap = max_line_gap
+
+        # 'opencv' uses cv2.HoughLinesP over all angles, 'numpy' uses a BandedHoughTransform
+        # which only votes over `angle_bands` (the same windows draw_lines filters on) and
+        # returns at most `max_lines` segments
+        self.backend = backend
+        self.banded_hough = BandedHoughTransform(angle_bands, theta, max_lines) if backend == 'numpy' else None
+
+        # 'single' searches the whole edge map once, 'pyramid' only searches strips around the
+        # lines a coarse pass over a `pyramid_scale` times smaller edge map found (opencv backend)
+        self.mode = mode
+        self.pyramid_hough = None
+        if mode == 'pyramid':
+            self.pyramid_hough = PyramidHoughTransform(angle_bands, theta, pyramid_scale, strip_width)
+
+    def find_lines(self, img, threshold=None):
+        """
+        Returns the line segments found in the edge image `img` as an (N, 1, 4) array or None.
+        `threshold` overrides self.threshold for this call.
+        """
+        if threshold is None:
+            threshold = self.threshold
+
+        if self.backend == 'numpy':
+            return self.banded_hough.find_lines(img, self.rho, threshold, self.min_line_length,
+                                                self.max_line_gap)
+
+        if self.mode == 'pyramid':
+            return self.pyramid_hough.find_lines(img, self.rho, self.theta, threshold, self.min_line_length,
+                                                 self.max_line_gap)
+
+        return cv2.HoughLinesP(img, self.rho, self.theta, threshold, np.array([]),
+                               minLineLength=self.min_line_length, maxLineGap=self.max_line_gap)
+
+
+class HoughThresholdController:
+    """
+    Feedback controller that keeps the number of Hough segments per frame inside [target_min, target_max].
+
+    Textured road makes HoughLinesP return far more segments than the fit needs, and every
+    one of them costs Python time in draw_lines. After each frame the vote threshold for
+    the next frame moves by `step` toward the target band. Once the threshold is pinned at
+    one of its limits, the Canny thresholds are shifted by `canny_step` as well (at most
+    `max_canny_offset` away from the configured ones), which thins out or restores edges.
+    Going back the other way, a Canny shift is undone before the threshold moves.
+    Every decision is counted in the pipeline's event log, and the current settings are
+    recorded as observations.
+    """
+
+    def __init__(self, target_min=8, target_max=40, step=2, min_threshold=5, max_threshold=120, canny_step=10,
+                 max_canny_offset=60):
+        self.target_min = target_min
+        self.target_max = target_max
+        self.step = step
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.canny_step = canny_step
+        self.max_canny_offset = max_canny_offset
+
+        self.threshold = None  # starts at HoughTransformPipeline.threshold
+        self.canny_offset = 0
+
+    def hough_threshold(self, hough_transform_pipeline):
+        if self.threshold is None:
+            self.threshold = hough_transform_pipeline.threshold
+        return self.threshold
+
+    def canny_thresholds(self, low_threshold, high_threshold):
+        # a negative offset can take the low threshold of the presets (50) below zero
+        return max(0, low_threshold + self.canny_offset), max(0, high_threshold + self.canny_offset)
+
+    def update(self, segment_count, event_log):
+        """Adjusts the thresholds for the next frame after a frame returned `segment_count` segments."""
+        if segment_count > self.target_max:
+            # take back any Canny edges we let in before raising the vote threshold
+            if self.canny_offset < 0:
+                self.canny_offset = min(0, self.canny_offset + self.canny_step)
+                decision = 'raise_canny_thresholds'
+            elif self.threshold < self.max_threshold:
+                self.threshold = min(self.max_threshold, self.threshold + self.step)
+                decision = 'raise_hough_threshold'
+            elif self.canny_offset < self.max_canny_offset:
+                self.canny_offset = min(self.max_canny_offset, self.canny_offset + self.canny_step)
+                decision = 'raise_canny_thresholds'
+            else:
+                decision = 'saturated_high'
+
+        elif segment_count < self.target_min:
+            # give back any Canny edges we took away before lowering the vote threshold
+            if self.canny_offset > 0:
+                self.canny_offset = max(0, self.canny_offset - self.canny_step)
+                decision = 'lower_canny_thresholds'
+            elif self.threshold > self.min_threshold:
+                self.threshold = max(self.min_threshold, self.threshold - self.step)
+                decision = 'lower_hough_threshold'
+            elif self.canny_offset > -self.max_canny_offset:
+                self.canny_offset = max(-self.max_canny_offset, self.canny_offset - self.canny_step)
+                decision = 'lower_canny_thresholds'
+            else:
+                decision = 'saturated_low'
+
+        else:
+            decision = 'hold'
+
+        event_log.count('hough_controller_' + decision)
+        event_log.observe('hough_threshold', self.threshold)
+        event_log.observe('canny_offset', self.canny_offset)
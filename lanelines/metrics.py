@@ -0,0 +1,140 @@
+"""
+Live metrics for long running pipelines, served in Prometheus text format.
+
+PipelineMetrics is what the pipeline updates: a frame counter and running totals of the
+time spent in each stage, all plain floats in a list. Only the thread running the
+pipeline ever writes them, so there are no locks, and a scrape reading them from
+another thread at worst sees a frame that is half accounted for. Segment counts and
+missed detections aren't counted twice, the scrape reads them out of the pipeline's
+PipelineEventLog. Anything else (a source's queue depth, say) can be added as a gauge,
+a callable that is only called when scraped.
+
+MetricsServer serves /metrics with http.server on a daemon thread, bound to localhost
+by default. Nothing is formatted until someone scrapes, so the per frame cost is a few
+time.perf_counter() calls whether or not a server is running.
+"""
+import threading
+import time
+
+STAGES = ('undistort', 'edges', 'detect', 'draw', 'blend')
+
+
+class PipelineMetrics:
+    """Pass as PipelineContext(metrics=...) to have process_image keep these up to date."""
+
+    def __init__(self, event_log=None):
+        self.event_log = event_log  # PipelineContext fills this in with its own
+        self.frames = 0
+        self.frame_seconds = 0.
+        self.last_frame_seconds = 0.
+        self.stage_seconds = [0.] * len(STAGES)
+        self.started = time.time()
+        self.gauges = {}
+
+    def add_frame(self, seconds):
+        self.frames += 1
+        self.frame_seconds += seconds
+        self.last_frame_seconds = seconds
+
+    def add_stage(self, stage, seconds):
+        # stage is an index into STAGES
+        self.stage_seconds[stage] += seconds
+
+    @staticmethod
+    def snapshot(mapping):
+        # the pipeline thread may add a key while we copy, just try again
+        while True:
+            try:
+                return dict(mapping)
+            except RuntimeError:
+                pass
+
+    def render(self):
+        """Returns every metric in Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append('# HELP lanelines_%s %s' % (name, help_text))
+            lines.append('# TYPE lanelines_%s %s' % (name, kind))
+            for labels, value in samples:
+                lines.append('lanelines_%s%s %r' % (name, labels, float(value)))
+
+        elapsed = time.time() - self.started
+        metric('frames_total', 'counter', 'Frames processed.', [('', self.frames)])
+        metric('frame_seconds_total', 'counter', 'Time spent in process_image.', [('', self.frame_seconds)])
+        metric('last_frame_seconds', 'gauge', 'Time the last frame took.', [('', self.last_frame_seconds)])
+        metric('fps', 'gauge', 'Frames per second since the metrics were created.',
+               [('', self.frames / elapsed if elapsed > 0 else 0.)])
+        metric('stage_seconds_total', 'counter', 'Time spent per pipeline stage.',
+               [('{stage="%s"}' % stage, seconds) for stage, seconds in zip(STAGES, list(self.stage_seconds))])
+
+        if self.event_log is not None:
+            counters = self.snapshot(self.event_log.counters)
+            metric('events_total', 'counter', 'Pipeline events (no_lines, no_left_lines, skipped frames, ...).',
+                   [('{kind="%s"}' % kind, count) for kind, count in sorted(counters.items())])
+
+            # a frame without any lines misses both lanes
+            missed = 2 * counters.get('no_lines', 0) + counters.get('no_left_lines', 0) + \
+                counters.get('no_right_lines', 0)
+            metric('missed_detection_rate', 'gauge', 'Missed lanes per lane expected, over all frames.',
+                   [('', missed / (2. * self.frames) if self.frames else 0.)])
+
+            observations = self.snapshot(self.event_log.observations)
+            samples = []
+            for name, (count, total, minimum, maximum) in sorted(observations.items()):
+                samples.append(('{name="%s",stat="count"}' % name, count))
+                samples.append(('{name="%s",stat="sum"}' % name, total))
+            metric('observation', 'counter', 'Counts and sums of observed values (segments, fit residuals, ...).',
+                   samples)
+
+        for name, gauge in sorted(self.snapshot(self.gauges).items()):
+            metric(name, 'gauge', 'Registered gauge.', [('', gauge())])
+
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serves `metrics`.render() at http://host:port/metrics from a daemon thread."""
+
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        # http.server pulls in email and friends, so only when a server is actually started
+        import http.server
+
+        self.metrics = metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split('?')[0] != '/metrics':
+                    handler.send_error(404)
+                    return
+
+                body = self.metrics.render().encode('utf-8')
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                # scrapes every few seconds would otherwise fill stderr
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
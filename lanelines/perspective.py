@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+
+class PerspectiveWarp:
+    """
+    Bird's-eye view of the road from a calibrated source quad.
+
+    `src_quad` is (bottom left, top left, top right, bottom right) as fractions of the
+    frame's (width, height), like PipelineContext.region_vertice_weights, so one
+    calibration serves every resolution of the same camera. It's mapped onto a
+    `dst_size` (width, height) image with the lane region spanning `dst_margin` to
+    1 - `dst_margin` of the width.
+
+    Only the quad is sampled and the warped image is just dst_size, so warping costs one
+    cv2.remap over the region of interest. The coordinate maps are computed once per
+    frame size and cached.
+    """
+
+    def __init__(self, src_quad, dst_size=(400, 600), dst_margin=0.25):
+        self.src_quad = np.float32(src_quad)
+        self.dst_size = dst_size
+
+        width, height = dst_size
+        self.dst_quad = np.float32([(width * dst_margin, height), (width * dst_margin, 0),
+                                    (width * (1 - dst_margin), 0), (width * (1 - dst_margin), height)])
+
+        # (height, width) -> (map1, map2, camera to bird's-eye matrix, bird's-eye to camera matrix)
+        self.cache = {}
+
+    def maps(self, frame_shape):
+        key = tuple(frame_shape[:2])
+        if key not in self.cache:
+            height, width = key
+            src_quad = self.src_quad * np.float32([width, height])
+            M = cv2.getPerspectiveTransform(src_quad, self.dst_quad)
+            M_inv = cv2.getPerspectiveTransform(self.dst_quad, src_quad)
+
+            # for every bird's-eye pixel, the camera pixel it samples (what warpPerspective computes per call)
+            dst_width, dst_height = self.dst_size
+            u, v = np.meshgrid(np.arange(dst_width, dtype=np.float32), np.arange(dst_height, dtype=np.float32))
+            src = cv2.perspectiveTransform(np.dstack((u, v)), M_inv)
+            map1, map2 = cv2.convertMaps(src[:, :, 0], src[:, :, 1], cv2.CV_16SC2)
+
+            self.cache[key] = (map1, map2, M, M_inv)
+
+        return self.cache[key]
+
+    def warp(self, img, interpolation=cv2.INTER_LINEAR):
+        map1, map2, M, M_inv = self.maps(img.shape)
+        return cv2.remap(img, map1, map2, interpolation)
+
+    def unwarp_points(self, points, frame_shape):
+        """Projects bird's-eye (N, 1, 2) points back into the camera frame."""
+        map1, map2, M, M_inv = self.maps(frame_shape)
+        return cv2.perspectiveTransform(np.asarray(points, dtype=np.float32), M_inv)
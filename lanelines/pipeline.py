@@ -0,0 +1,1167 @@
+import json
+import math
+import time
+
+import cv2
+import numpy as np
+
+from lanelines.constants import FPS
+from lanelines.events import PipelineEventLog
+from lanelines.histogram import SlidingWindowDetector
+from lanelines.hough import HoughTransformPipeline, merge_collinear_segments
+from lanelines.tracking import LaneKalmanTracker
+
+
+class LaneLine:
+    def __init__(self, x1, y1, x2, y2):
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+
+    def angle(self):
+        return math.atan2(self.y2 - self.y1, self.x2 - self.x1) * 180.0 / np.pi
+
+    def slope(self):
+        return (self.y2 - self.y1) / (self.x2 - self.x1)
+
+    def y_intercept(self):
+        return self.y1 - self.slope() * self.x1
+
+    def __str__(self):
+        return "(x1, y1, x2, y2, slope, y_intercept, angle) == (%s, %s, %s, %s, %s, %s, %s)" % (
+            self.x1, self.y1, self.x2, self.y2, self.slope(), self.y_intercept(), self.angle())
+
+
+class PipelineContext:
+    def __init__(self,
+                 colorspace=None,
+                 thickness=5,
+                 gaussian_kernel_size=5,
+                 canny_low_threshold=50,
+                 canny_high_threshold=150,
+                 region_bottom_offset=55,
+                 region_vertice_weights=np.array([(1, 1), (0.48, 0.60), (0.54, 0.60), (1, 1)]),
+                 hough_transform_pipeline=HoughTransformPipeline(),
+                 line_color=[255, 0, 0],
+                 ema_period_alpha=0.65,
+                 line_fitter='least_squares',
+                 ransac_max_iterations=50,
+                 ransac_batch_size=10,
+                 ransac_inlier_threshold=3.,
+                 ransac_min_inlier_ratio=0.8,
+                 profile_line_fitters=False,
+                 lane_model='linear',
+                 curve_points=20,
+                 smoothing='ema',
+                 kalman_tracker=None,
+                 event_log=None,
+                 segment_recorder=None,
+                 hough_threshold_controller=None,
+                 merge_segments=False,
+                 merge_angle_bin=2.,
+                 merge_intercept_bin=10.,
+                 detector='hough',
+                 sliding_window_detector=None,
+                 perspective=None,
+                 undistorter=None,
+                 edge_detector=None,
+                 frame_screen=None,
+                 metrics=None):
+        self.thickness = thickness
+        self.gaussian_kernel_size = gaussian_kernel_size  # Must be an odd number (3, 5, 7...)
+        self.canny_low_threshold = canny_low_threshold
+        self.canny_high_threshold = canny_high_threshold
+        self.region_bottom_offset = region_bottom_offset
+        self.region_vertice_weights = region_vertice_weights
+        self.hough_transform_pipeline = hough_transform_pipeline
+        self.line_color = line_color
+        self.vertices = None
+        self.colorspace = colorspace
+        self.current_frame = 0
+
+        self.l_abs_min_y = None
+        self.r_abs_min_y = None
+
+        self.l_m_measurements = np.array([])
+        self.l_b_measurements = np.array([])
+        self.l_m_ema = 0
+        self.l_b_ema = 0
+
+        self.r_m_measurements = np.array([])
+        self.r_b_measurements = np.array([])
+        self.r_m_ema = 0
+        self.r_b_ema = 0
+
+        self.ema_fps_period = ema_period_alpha * FPS
+
+        # 'least_squares' or 'ransac'. RANSAC ignores stray segments (guard rails, car edges)
+        # that survive the angle filter in draw_lines so we don't need as much EMA smoothing.
+        self.line_fitter = line_fitter
+        self.ransac_max_iterations = ransac_max_iterations  # max hypotheses scored per fit
+        self.ransac_batch_size = ransac_batch_size  # hypotheses scored per vectorized pass
+        self.ransac_inlier_threshold = ransac_inlier_threshold  # perpendicular distance in pixels
+        self.ransac_min_inlier_ratio = ransac_min_inlier_ratio  # stop early once this many points agree
+        self.random_state = np.random.RandomState(0)
+
+        # When True every fitter runs on each lane so their timings can be compared.
+        # Only the result of self.line_fitter is used.
+        self.profile_line_fitters = profile_line_fitters
+
+        # fitter name -> (fit count, total seconds)
+        self.fit_timings = {}
+
+        # 'linear' draws straight lines, 'quadratic' fits x = a*y^2 + b*y + c to follow curves
+        self.lane_model = lane_model
+        self.curve_points = curve_points  # number of vertices in each rendered curve
+
+        # (a, b, c) coefficients, smoothed the same way as the straight line (m, b)
+        self.l_curve_measurements = np.empty((0, 3))
+        self.l_curve_ema = np.zeros(3)
+
+        self.r_curve_measurements = np.empty((0, 3))
+        self.r_curve_ema = np.zeros(3)
+
+        # 'ema' uses compute_ema on each (m, b) separately, 'kalman' tracks both lanes with
+        # a LaneKalmanTracker which also keeps drawing lanes through missed detections.
+        # The quadratic lane model is always smoothed with EMA.
+        self.smoothing = smoothing
+        self.kalman_tracker = kalman_tracker if kalman_tracker is not None else LaneKalmanTracker()
+
+        # missed detections, segment counts and fit residuals go here rather than stdout
+        self.event_log = event_log if event_log is not None else PipelineEventLog()
+
+        # optional lanelines.replay.SegmentRecorder that keeps every frame's raw Hough output
+        self.segment_recorder = segment_recorder
+
+        # optional lanelines.hough.HoughThresholdController that adapts the Hough and
+        # Canny thresholds frame by frame to keep the segment count bounded
+        self.hough_threshold_controller = hough_threshold_controller
+
+        # collapse the many overlapping segments a large max_line_gap produces before fitting,
+        # see lanelines.hough.merge_collinear_segments
+        self.merge_segments = merge_segments
+        self.merge_angle_bin = merge_angle_bin  # degrees
+        self.merge_intercept_bin = merge_intercept_bin  # pixels along the bottom of the region
+
+        # 'hough' runs self.hough_transform_pipeline on the masked edges, 'histogram' runs the
+        # cheaper lanelines.histogram.SlidingWindowDetector on them instead
+        self.detector = detector
+        self.sliding_window_detector = (sliding_window_detector if sliding_window_detector is not None
+                                        else SlidingWindowDetector())
+
+        # optional lanelines.perspective.PerspectiveWarp. When set, edges are found and lanes are
+        # fit as x = f(y) in a bird's-eye view where they're close to vertical, so neither the
+        # angle windows in draw_lines nor the region weights need retuning per clip. The fitted
+        # lanes are projected back onto the camera frame for rendering.
+        self.perspective = perspective
+
+        # optional lanelines.camera.CameraUndistorter applied to every frame before anything else
+        self.undistorter = undistorter
+
+        # optional lanelines.stripes.StripedEdgeDetector that runs blur and Canny on stripes of
+        # the frame concurrently, for lower latency on large frames. Same edges either way.
+        self.edge_detector = edge_detector
+
+        # optional lanelines.screening.FrameScreen. Frames it rejects (tunnels, night, glare)
+        # skip detection entirely and keep showing the lanes drawn for the last good frame.
+        self.frame_screen = frame_screen
+        self.held_lines = None
+
+        # optional lanelines.metrics.PipelineMetrics, frame and per stage timings for a live
+        # /metrics endpoint. Segment counts and misses are read from self.event_log.
+        self.metrics = metrics
+        if metrics is not None and metrics.event_log is None:
+            metrics.event_log = self.event_log
+
+        # (x1, y1, x2, y2) of the lane lines drawn for the current frame, None when not drawn
+        self.left_lane = None
+        self.right_lane = None
+
+    # everything that carries from one frame to the next
+    STATE_ATTRIBUTES = ('current_frame', 'l_abs_min_y', 'r_abs_min_y',
+                        'l_m_measurements', 'l_b_measurements', 'l_m_ema', 'l_b_ema',
+                        'r_m_measurements', 'r_b_measurements', 'r_m_ema', 'r_b_ema',
+                        'l_curve_measurements', 'l_curve_ema', 'r_curve_measurements', 'r_curve_ema')
+
+    def get_state(self):
+        """Returns the frame to frame smoothing state as a dict of arrays (see set_state)."""
+        state = {}
+        for name in self.STATE_ATTRIBUTES:
+            value = getattr(self, name)
+            # None can't be stored in an array, -1 is never a valid y
+            state[name] = np.asarray(-1 if value is None else value)
+
+        for name, value in self.kalman_tracker.get_state().items():
+            state['kalman_' + name] = value
+
+        return state
+
+    def set_state(self, state):
+        """Restores a state returned by get_state so processing continues where it left off."""
+        for name in self.STATE_ATTRIBUTES:
+            value = state[name]
+            if value.ndim == 0:
+                value = value.item()
+                if name.endswith('abs_min_y') and value == -1:
+                    value = None
+            setattr(self, name, value)
+
+        self.kalman_tracker.set_state({name[len('kalman_'):]: value for name, value in state.items()
+                                       if name.startswith('kalman_')})
+
+    def process_video(self, src_video_path, dst_video_path, audio=False):
+        # moviepy is slow to import and only needed for video so it is loaded here rather than at module level
+        from moviepy.editor import VideoFileClip
+
+        self.current_frame = 0
+        VideoFileClip(src_video_path).fl_image(self.process_image).write_videofile(dst_video_path, audio=audio)
+        print(self.fit_timing_report())
+        if self.frame_screen is not None:
+            print(json.dumps(self.frame_screen.report()))
+        print(json.dumps(self.event_log.close()))
+
+    def process_image(self, image):
+        self.current_frame += 1
+        frame_start = stage_start = time.perf_counter()
+
+        if self.undistorter is not None:
+            image = self.undistorter.undistort(image)
+        stage_start = self.stage_done(0, stage_start)
+
+        gray_img = self.gray_channel(image)
+
+        if self.frame_is_usable(gray_img):
+            masked_edges = self.find_gray_edges(gray_img)
+            self.stage_done(1, stage_start)
+
+            # Define the Hough transform parameters
+            # Make a blank the same size as our image to draw on
+
+            hough = self.hough_lines(image, masked_edges)
+            self.held_lines = hough
+        else:
+            hough = self.held_lines if self.held_lines is not None and self.held_lines.shape == image.shape \
+                else np.zeros_like(image)
+            self.stage_done(1, stage_start)
+
+        stage_start = time.perf_counter()
+        α = 0.8
+        β = 0.6
+        λ = 0.
+        weighted_hough = self.weighted_img(hough, image, α, β, λ)
+
+        if self.metrics is not None:
+            self.stage_done(4, stage_start)
+            self.metrics.add_frame(time.perf_counter() - frame_start)
+
+        return weighted_hough
+
+    def stage_done(self, stage, stage_start):
+        """Adds the time since `stage_start` to stage `stage` (see lanelines.metrics.STAGES). Returns now."""
+        now = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.add_stage(stage, now - stage_start)
+        return now
+
+    def process_batch(self, frames):
+        """
+        process_image over a (T, H, W, 3) stack of frames, returning a (T, H, W, 3) stack.
+
+        The per pixel steps (channel extraction, region masking and the final blend) each run
+        as a single OpenCV/NumPy call over the whole stack. Blur, Canny and the detector still
+        run per frame since they look across frame borders. Segment classification and the
+        least squares fits run over every segment of the batch at once, and then the EMA or
+        Kalman update and drawing are applied frame by frame in order. Results are identical
+        to calling process_image on each frame. Configurations that carry state between
+        detection steps (hough_threshold_controller), skip some of them (frame_screen) or
+        warp the view (perspective) fall back to exactly that.
+        """
+        batch_start = time.perf_counter()
+        frames = np.asarray(frames)
+        if self.hough_threshold_controller is not None or self.perspective is not None or \
+                self.frame_screen is not None:
+            return np.array([self.process_image(frame) for frame in frames])
+
+        if self.undistorter is not None:
+            frames = np.array([self.undistorter.undistort(frame) for frame in frames])
+
+        n_frames, height, width = frames.shape[:3]
+
+        # per pixel conversions don't care that the stack is one very tall image
+        gray = self.gray_channel(frames.reshape((n_frames * height, width, -1))).reshape((n_frames, height, width))
+
+        self.update_vertices(frames.shape[1:])
+        mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(mask, self.vertices, 255)
+
+        edges = np.array([self.blurred_edges(gray_img, self.canny_low_threshold, self.canny_high_threshold)
+                          for gray_img in gray])
+        masked_edges = np.bitwise_and(edges, mask)
+
+        all_lines = []
+        for frame_edges in masked_edges:
+            lines = self.detect_lines(frame_edges, frames.shape[1:])
+            if self.merge_segments:
+                lines = merge_collinear_segments(lines, self.vertices[0][0][1], self.merge_angle_bin,
+                                                 self.merge_intercept_bin)
+            all_lines.append(lines)
+
+        # every segment of the batch with the frame it came from
+        counts = np.array([0 if lines is None else len(lines) for lines in all_lines])
+        segments = np.concatenate([lines.reshape((-1, 4)) for lines in all_lines if lines is not None] or
+                                  [np.empty((0, 4), dtype=np.int32)])
+        segment_frames = np.repeat(np.arange(n_frames), counts)
+
+        x1, y1, x2, y2 = segments.T
+        angles = np.arctan2(y2 - y1, x2 - x1) * 180.0 / np.pi
+        sides = np.full(len(segments), -1)
+        sides[(-50 < angles) & (angles <= -25)] = 0
+        sides[(20 <= angles) & (angles <= 45)] = 1
+
+        fits = None
+        if self.lane_model == 'linear' and self.line_fitter == 'least_squares' and not self.profile_line_fitters:
+            fits = self.batch_least_squares_fits(segments, segment_frames * 2 + sides, sides >= 0, n_frames)
+
+        lane_imgs = np.zeros_like(frames)
+        for frame in range(n_frames):
+            self.current_frame += 1
+
+            if counts[frame] <= 0:
+                self.draw_lines(lane_imgs[frame], None)
+                continue
+
+            # same bookkeeping as draw_lines, minus the merge which already happened above
+            self.left_lane = None
+            self.right_lane = None
+            self.event_log.observe('segments', int(counts[frame]))
+
+            in_frame = segment_frames == frame
+
+            side_lines = []
+            for side in (0, 1):
+                side_lines.append([LaneLine(*segment) for segment in segments[in_frame & (sides == side)].tolist()])
+
+            left_fit = right_fit = None
+            if fits is not None:
+                left_fit = None if len(side_lines[0]) <= 0 else tuple(fits[frame * 2])
+                right_fit = None if len(side_lines[1]) <= 0 else tuple(fits[frame * 2 + 1])
+
+            self.draw_lane_lines(lane_imgs[frame], int(counts[frame]), side_lines[0], side_lines[1], left_fit, right_fit)
+
+        α = 0.8
+        β = 0.6
+        λ = 0.
+        weighted = self.weighted_img(lane_imgs.reshape((n_frames * height, width, -1)),
+                                     frames.reshape((n_frames * height, width, -1)), α, β, λ)
+
+        if self.metrics is not None:
+            # stages overlap across the batch so only whole frames are timed, evenly split
+            for _ in range(n_frames):
+                self.metrics.add_frame((time.perf_counter() - batch_start) / n_frames)
+
+        return weighted.reshape(frames.shape)
+
+    def batch_least_squares_fits(self, segments, groups, keep, n_frames):
+        """
+        compute_least_squares_line for every (frame, side) group of a batch at once.
+
+        `groups` is frame * 2 + side for every segment and `keep` selects the classified
+        ones. Sums of integer coordinates are exact in float64 so the fits are bit for bit
+        what compute_least_squares_line returns. Returns a (n_frames * 2, 2) array of (m, b).
+        """
+        n_groups = n_frames * 2
+        groups = np.concatenate((groups[keep], groups[keep]))
+        x = np.concatenate((segments[keep, 0], segments[keep, 2])).astype(np.float64)
+        y = np.concatenate((segments[keep, 1], segments[keep, 3])).astype(np.float64)
+
+        n = np.bincount(groups, minlength=n_groups).astype(np.float64)
+        sum_x = np.bincount(groups, x, n_groups)
+        sum_y = np.bincount(groups, y, n_groups)
+        sum_xy = np.bincount(groups, x * y, n_groups)
+        sum_xx = np.bincount(groups, x * x, n_groups)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            denominator = (n * sum_xx) - (sum_x ** 2)
+            m = ((n * sum_xy) - (sum_x * sum_y)) / denominator
+            b = ((sum_y * sum_xx) - (sum_x * sum_xy)) / denominator
+
+            residuals = (m[groups] * x - y + b[groups]) ** 2 / (1 + m[groups] ** 2)
+            rms = np.sqrt(np.bincount(groups, residuals, n_groups) / n)
+
+        for group in np.flatnonzero(n > 0):
+            self.event_log.observe('fit_residual_px', rms[group])
+
+        return np.column_stack((m, b))
+
+    def process_luma(self, luma):
+        """
+        Geometry only counterpart of process_image for a single channel frame, such as the
+        Y plane straight from the decoder (see lanelines.video.iter_luma_frames).
+
+        There is no color conversion and nothing is rendered. Returns the
+        (left_lane, right_lane) endpoints, either of which may be None.
+        """
+        self.current_frame += 1
+        frame_start = stage_start = time.perf_counter()
+
+        if self.undistorter is not None:
+            luma = self.undistorter.undistort(luma)
+        stage_start = self.stage_done(0, stage_start)
+
+        if self.frame_is_usable(luma):
+            masked_edges = self.find_gray_edges(luma)
+            self.stage_done(1, stage_start)
+
+            # lines still get drawn by the shared code, onto a blank luma sized image nobody looks at
+            self.hough_lines(luma, masked_edges)
+        else:
+            # left_lane and right_lane still are the last good frame's
+            self.stage_done(1, stage_start)
+
+        if self.metrics is not None:
+            self.metrics.add_frame(time.perf_counter() - frame_start)
+
+        return self.left_lane, self.right_lane
+
+    def process_video_luma(self, src_video_path):
+        """
+        Runs process_luma over every frame of a video decoded straight to its luma plane.
+
+        Returns a (frames, 2, 4) float array of left and right lane endpoints with NaN where
+        a lane wasn't found, the same layout lanelines.replay.replay returns.
+        """
+        from lanelines.video import iter_luma_frames
+
+        self.current_frame = 0
+        lanes = []
+        for luma in iter_luma_frames(src_video_path):
+            left_lane, right_lane = self.process_luma(luma)
+            lanes.append((left_lane if left_lane is not None else (np.nan,) * 4,
+                          right_lane if right_lane is not None else (np.nan,) * 4))
+
+        return np.array(lanes, dtype=np.float64).reshape((-1, 2, 4))
+
+    def frame_is_usable(self, gray_img):
+        """False when self.frame_screen judges the frame not worth running detection on."""
+        if self.frame_screen is None:
+            return True
+
+        self.update_vertices(gray_img.shape)
+        return self.frame_screen.screen(gray_img, self.vertices, self.event_log, self.current_frame)
+
+    def gray_channel(self, image):
+        """Returns the single channel of `image` that edges are detected on, according to self.colorspace."""
+        cvt_img = image
+        if self.colorspace is 'yuv':
+            cvt_img = self.yuv(image)
+            gray_img = cvt_img[:, :, 0]
+
+        elif self.colorspace == 'hls':
+            cvt_img = self.hls(image)
+            gray_img = cvt_img[:, :, 1]
+
+        elif self.colorspace == 'hsv':
+            cvt_img = self.hsv(image)
+            gray_img = cvt_img[:, :, 2]
+        else:
+            # call as plt.imshow(gray, cmap='gray') to show a grayscaled image
+            gray_img = self.grayscale(cvt_img)
+
+        return gray_img
+
+    def find_edges(self, image):
+        """
+        Returns the Canny edges of `image` inside the region of interest, or of the
+        bird's-eye view when self.perspective is set.
+        """
+        return self.find_gray_edges(self.gray_channel(image))
+
+    def find_gray_edges(self, gray_img):
+        """find_edges for an image that already is the single channel gray_channel would pick."""
+        frame_shape = gray_img.shape
+        if self.perspective is not None:
+            gray_img = self.perspective.warp(gray_img)
+
+        # Define our parameters for Canny and run it
+        low_threshold = self.canny_low_threshold
+        high_threshold = self.canny_high_threshold
+        if self.hough_threshold_controller is not None:
+            low_threshold, high_threshold = self.hough_threshold_controller.canny_thresholds(low_threshold,
+                                                                                             high_threshold)
+        edges = self.blurred_edges(gray_img, low_threshold, high_threshold)
+
+        # if self.current_frame > 0:
+        #     mpimg.imsave('{}_orig'.format(str(self.current_frame)), image)
+        #     mpimg.imsave("{}_orig_gray".format(str(self.current_frame)), self.grayscale(image), cmap='gray')
+        #     mpimg.imsave("{}_{}_gray".format(str(self.current_frame), self.colorspace), gray_img, cmap='gray')
+
+        # This time we are defining a four sided polygon to mask
+        self.update_vertices(frame_shape)
+
+        if self.perspective is not None:
+            # the warp only covers the region already
+            return edges
+
+        return self.region_of_interest(edges)
+
+    def blurred_edges(self, gray_img, low_threshold, high_threshold):
+        """Gaussian blur followed by Canny, on stripes in parallel when self.edge_detector is set."""
+        if self.edge_detector is not None:
+            return self.edge_detector.find_edges(gray_img, self.gaussian_kernel_size, low_threshold, high_threshold)
+
+        # Define a kernel size for Gaussian smoothing / blurring
+        blur_img = self.gaussian_noise(gray_img, self.gaussian_kernel_size)
+        return self.canny(blur_img, low_threshold, high_threshold)
+
+    def update_vertices(self, imshape):
+        bottom_offset = self.region_bottom_offset
+        img_height = imshape[0]
+        img_width = imshape[1]
+
+        # (W, H) == (x, y)
+        self.vertices = np.array([
+            [
+                # bottom left
+                (bottom_offset, img_height) * self.region_vertice_weights[0],
+
+                # top left
+                (img_width, img_height) * self.region_vertice_weights[1],
+
+                # top right
+                (img_width, img_height) * self.region_vertice_weights[2],
+
+                # bottom right
+                (img_width - bottom_offset, img_height) * self.region_vertice_weights[3]
+            ]
+        ], dtype=np.int32)
+
+    @staticmethod
+    def hls(img):
+        """Converts colorspace from RGB to HLS
+        This will return an image with HLS color space
+        but NOTE: to see the returned image as HLS
+        you should call plt.imshow(hls)"""
+        return cv2.cvtColor(img, cv2.COLOR_BGR2HLS)
+
+    @staticmethod
+    def hsv(img):
+        """Converts colorspace from RGB to HSV
+        This will return an image with HSV color space
+        but NOTE: to see the returned image as HSV
+        you should call plt.imshow(hsv)"""
+        return cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+
+    @staticmethod
+    def yuv(img):
+        """Converts colorspace from RGB to YUV
+        This will return an image with YUV color space
+        but NOTE: to see the returned image as YUV
+        you should call plt.imshow(yuv)"""
+        return cv2.cvtColor(img, cv2.COLOR_BGR2YUV)
+
+    @staticmethod
+    def grayscale(img):
+        """Applies the Grayscale transform
+        This will return an image with only one color channel
+        but NOTE: to see the returned image as grayscale
+        you should call plt.imshow(gray, cmap='gray')"""
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    @staticmethod
+    def canny(img, low_threshold, high_threshold):
+        """Applies the Canny transform"""
+        return cv2.Canny(img, low_threshold, high_threshold)
+
+    @staticmethod
+    def gaussian_noise(img, kernel_size):
+        """Applies a Gaussian Noise kernel"""
+        return cv2.GaussianBlur(img, (kernel_size, kernel_size), 0)
+
+    def region_of_interest(self, img):
+        """
+        Applies an image mask.
+
+        Only keeps the region of the image defined by the polygon
+        formed from `vertices`. The rest of the image is set to black.
+        """
+        # defining a blank mask to start with
+        mask = np.zeros_like(img)
+
+        # defining a 3 channel or 1 channel color to fill the mask with depending on the input image
+        if len(img.shape) > 2:
+            channel_count = img.shape[2]  # i.e. 3 or 4 depending on your image
+            ignore_mask_color = (255,) * channel_count
+        else:
+            ignore_mask_color = 255
+
+        # filling pixels inside the polygon defined by "vertices" with the fill color
+        cv2.fillPoly(mask, self.vertices, ignore_mask_color)
+
+        # returning the image only where mask pixels are nonzero
+        masked_image = cv2.bitwise_and(img, mask)
+        return masked_image
+
+    def compute_ema(self, measurement, all_measurements, curr_ema):
+        sma = sum(all_measurements) / (len(all_measurements))
+
+        if len(all_measurements) < self.ema_fps_period:
+            # let's just use SMA until
+            # our EMA buffer is filled
+            return sma
+
+        multiplier = 2 / float(len(all_measurements) + 1)
+        ema = (measurement - curr_ema) * multiplier + curr_ema
+
+        # print("sma: %s, multiplier: %s" % (sma, multiplier))
+        return ema
+
+    @staticmethod
+    def compute_least_squares_line(lines):
+        all_x1 = []
+        all_y1 = []
+        all_x2 = []
+        all_y2 = []
+
+        for line in lines:
+            x1, y1, x2, y2, angle, m, b = line.x1, line.y1, line.x2, line.y2, line.angle(), line.slope(), line.y_intercept()
+            all_x1.append(x1)
+            all_y1.append(y1)
+            all_x2.append(x2)
+            all_y2.append(y2)
+
+        all_x = (all_x1 + all_x2)
+        all_y = (all_y1 + all_y2)
+
+        # This is a tab less precise
+        # mean_x = sum(all_x) / len(all_x)
+        # mean_y = sum(all_y) / len(all_y)
+
+        # m = sum([(xi - mean_x) * (yi - mean_y) for xi, yi in zip(all_x, all_y)]) / sum([(xi - mean_x) ** 2 for xi in zip(all_x)])
+        # b = mean_y - m * mean_x
+        # print('m: %s, b: %s' % (m, b))
+        # return m[0], b[0]
+
+        n = len(all_x)
+
+        all_x_y_dot_prod = sum([xi * yi for xi, yi in zip(all_x, all_y)])
+        all_x_squares = sum([xi ** 2 for xi in all_x])
+
+        a = ((n * all_x_y_dot_prod) - (sum(all_x) * sum(all_y))) / ((n * all_x_squares) - (sum(all_x) ** 2))
+        b = ((sum(all_y) * all_x_squares) - (sum(all_x) * all_x_y_dot_prod)) / ((n * all_x_squares) - (sum(all_x) ** 2))
+
+        # print('m: %s, b: %s' % (m, b))
+
+        return a, b
+
+    @staticmethod
+    def lane_line_points(lines):
+        """Returns the endpoints of `lines` as (segments, x, y) float arrays."""
+        segments = np.array([(line.x1, line.y1, line.x2, line.y2) for line in lines], dtype=np.float64)
+        x = np.concatenate((segments[:, 0], segments[:, 2]))
+        y = np.concatenate((segments[:, 1], segments[:, 3]))
+        return segments, x, y
+
+    @staticmethod
+    def least_squares_fit(x, y):
+        """Vectorized version of compute_least_squares_line over point arrays."""
+        n = len(x)
+        sum_x = x.sum()
+        sum_y = y.sum()
+        sum_xy = np.dot(x, y)
+        sum_xx = np.dot(x, x)
+
+        denominator = (n * sum_xx) - (sum_x ** 2)
+        m = ((n * sum_xy) - (sum_x * sum_y)) / denominator
+        b = ((sum_y * sum_xx) - (sum_x * sum_xy)) / denominator
+        return m, b
+
+    def compute_ransac_line(self, lines):
+        """
+        Fits y = m*x + b to the endpoints of `lines` while ignoring outlier segments.
+
+        Every segment already is a two point sample so each hypothesis is simply the
+        line through one segment. Hypotheses are scored in batches of
+        self.ransac_batch_size against all endpoints at once and we stop as soon as
+        self.ransac_min_inlier_ratio of the points agree or self.ransac_max_iterations
+        hypotheses have been scored. The winning inliers are then refit with least squares.
+        """
+        segments, x, y = self.lane_line_points(lines)
+
+        n_hypotheses = min(len(segments), self.ransac_max_iterations)
+        order = self.random_state.permutation(len(segments))[:n_hypotheses]
+        min_inliers = self.ransac_min_inlier_ratio * len(x)
+
+        best_inliers = None
+        best_count = -1
+        best_line = None
+
+        for start in range(0, n_hypotheses, self.ransac_batch_size):
+            hypotheses = segments[order[start:start + self.ransac_batch_size]]
+            m = (hypotheses[:, 3] - hypotheses[:, 1]) / (hypotheses[:, 2] - hypotheses[:, 0])
+            b = hypotheses[:, 1] - m * hypotheses[:, 0]
+
+            # perpendicular distance of every endpoint to every hypothesis
+            distances = np.abs(np.outer(m, x) - y + b[:, np.newaxis]) / np.sqrt(1 + m ** 2)[:, np.newaxis]
+            inliers = distances <= self.ransac_inlier_threshold
+            counts = inliers.sum(axis=1)
+
+            i = counts.argmax()
+            if counts[i] > best_count:
+                best_count = counts[i]
+                best_inliers = inliers[i]
+                best_line = (m[i], b[i])
+
+            if best_count >= min_inliers:
+                break
+
+        inlier_x = x[best_inliers]
+        if len(np.unique(inlier_x)) < 2:
+            return best_line
+
+        return self.least_squares_fit(inlier_x, y[best_inliers])
+
+    def fit_line(self, lines):
+        """Fits a lane line to `lines` with self.line_fitter and records how long it took."""
+        fitters = {
+            'least_squares': self.compute_least_squares_line,
+            'ransac': self.compute_ransac_line
+        }
+
+        names = fitters.keys() if self.profile_line_fitters else [self.line_fitter]
+
+        result = None
+        for name in names:
+            start = time.perf_counter()
+            line = fitters[name](lines)
+            elapsed = time.perf_counter() - start
+
+            count, total = self.fit_timings.get(name, (0, 0.))
+            self.fit_timings[name] = (count + 1, total + elapsed)
+
+            if name == self.line_fitter:
+                result = line
+
+        m, b = result
+        segments, x, y = self.lane_line_points(lines)
+        residuals = np.abs(m * x - y + b) / np.sqrt(1 + m ** 2)
+        self.event_log.observe('fit_residual_px', np.sqrt(np.mean(residuals ** 2)))
+
+        return result
+
+    @staticmethod
+    def compute_quadratic_curve(lines, degree=2):
+        """
+        Fits x = a*y^2 + b*y + c to the endpoints of `lines`.
+
+        x is a function of y because lane lines are close to vertical in the image.
+        Falls back to a straight line (a == 0) when there are too few distinct rows
+        to support a quadratic, or when `degree` is 1.
+        """
+        segments, x, y = PipelineContext.lane_line_points(lines)
+
+        degree = min(degree, len(np.unique(y)) - 1)
+        vandermonde = np.vander(y, 3)[:, 2 - degree:]
+        coefficients = np.linalg.lstsq(vandermonde, x, rcond=None)[0]
+
+        return np.concatenate((np.zeros(2 - degree), coefficients))
+
+    def smooth_curve(self, coefficients, measurements, curr_ema):
+        """Runs compute_ema over all curve coefficients at once. Returns (measurements, ema)."""
+        measurements = np.vstack((measurements, coefficients))
+        ema = self.compute_ema(coefficients, measurements, curr_ema)
+
+        if len(measurements) > self.ema_fps_period:
+            measurements = np.delete(measurements, 0, axis=0)
+
+        return measurements, ema
+
+    def curve_vertices(self, coefficients, y_top, y_bottom):
+        y = np.linspace(y_top, y_bottom, self.curve_points)
+        x = np.polyval(coefficients, y)
+        return np.column_stack((x, y)).astype(np.int32).reshape((-1, 1, 2))
+
+    def draw_curves(self, img, left_lines, right_lines):
+        """Quadratic counterpart of draw_left_line and draw_right_line. Both curves are drawn with one call."""
+        curves = []
+
+        if len(left_lines) > 0:
+            all_y2 = [line.y2 for line in left_lines]
+            if self.l_abs_min_y is None:
+                self.l_abs_min_y = min(all_y2)
+            self.l_abs_min_y = min(self.l_abs_min_y, int(sum(all_y2) / len(all_y2)))
+
+            coefficients = self.compute_quadratic_curve(left_lines)
+            self.l_curve_measurements, self.l_curve_ema = self.smooth_curve(coefficients,
+                                                                            self.l_curve_measurements,
+                                                                            self.l_curve_ema)
+            curves.append(self.curve_vertices(self.l_curve_ema, self.l_abs_min_y, self.vertices[0][0][1]))
+            self.left_lane = tuple(curves[-1][-1, 0]) + tuple(curves[-1][0, 0])
+
+        if len(right_lines) > 0:
+            all_y1 = [line.y1 for line in right_lines]
+            if self.r_abs_min_y is None:
+                self.r_abs_min_y = min(all_y1)
+            self.r_abs_min_y = min(self.r_abs_min_y, int(sum(all_y1) / len(all_y1)))
+
+            coefficients = self.compute_quadratic_curve(right_lines)
+            self.r_curve_measurements, self.r_curve_ema = self.smooth_curve(coefficients,
+                                                                            self.r_curve_measurements,
+                                                                            self.r_curve_ema)
+            curves.append(self.curve_vertices(self.r_curve_ema, self.r_abs_min_y, self.vertices[0][3][1]))
+            self.right_lane = tuple(curves[-1][0, 0]) + tuple(curves[-1][-1, 0])
+
+        if len(curves) > 0:
+            cv2.polylines(img, curves, False, self.line_color, self.thickness)
+
+    def draw_warped_lanes(self, img, lines, warped_shape):
+        """
+        Bird's-eye counterpart of draw_lines. `lines` are segments in the warped image.
+
+        Lanes are near vertical in the bird's-eye view so segments are split into left and
+        right by which half of the view they're in rather than by angle. Each side is fit
+        as x = f(y) (quadratic when self.lane_model is 'quadratic', straight otherwise) and
+        smoothed with EMA. The fitted curves are sampled over the full height of the view
+        and projected back onto `img`.
+        """
+        self.left_lane = None
+        self.right_lane = None
+
+        if lines is None or len(lines) <= 0:
+            self.event_log.record('no_lines', self.current_frame)
+            return
+
+        self.event_log.observe('segments', len(lines))
+
+        center = warped_shape[1] / 2.
+        left_lines = []
+        right_lines = []
+        for x1, y1, x2, y2 in np.asarray(lines).reshape((-1, 4)):
+            if x1 + x2 < 2 * center:
+                left_lines.append(LaneLine(x1, y1, x2, y2))
+            else:
+                right_lines.append(LaneLine(x1, y1, x2, y2))
+
+        degree = 2 if self.lane_model == 'quadratic' else 1
+        warped_height = warped_shape[0]
+        curves = []
+
+        if len(left_lines) > 0:
+            coefficients = self.compute_quadratic_curve(left_lines, degree)
+            self.l_curve_measurements, self.l_curve_ema = self.smooth_curve(coefficients,
+                                                                            self.l_curve_measurements,
+                                                                            self.l_curve_ema)
+            curve = self.perspective.unwarp_points(self.curve_vertices(self.l_curve_ema, 0, warped_height),
+                                                   img.shape).astype(np.int32)
+            curves.append(curve)
+            self.left_lane = tuple(curve[-1, 0]) + tuple(curve[0, 0])
+        else:
+            self.event_log.record('no_left_lines', self.current_frame, segments=len(lines))
+
+        if len(right_lines) > 0:
+            coefficients = self.compute_quadratic_curve(right_lines, degree)
+            self.r_curve_measurements, self.r_curve_ema = self.smooth_curve(coefficients,
+                                                                            self.r_curve_measurements,
+                                                                            self.r_curve_ema)
+            curve = self.perspective.unwarp_points(self.curve_vertices(self.r_curve_ema, 0, warped_height),
+                                                   img.shape).astype(np.int32)
+            curves.append(curve)
+            self.right_lane = tuple(curve[0, 0]) + tuple(curve[-1, 0])
+        else:
+            self.event_log.record('no_right_lines', self.current_frame, segments=len(lines))
+
+        if len(curves) > 0:
+            cv2.polylines(img, curves, False, self.line_color, self.thickness)
+
+    def fit_timing_report(self):
+        """Returns the average time per lane fit for every fitter that ran."""
+        report = []
+        for name, (count, total) in sorted(self.fit_timings.items()):
+            report.append('%s: %d fits, %.1f us/fit' % (name, count, total / count * 1e6))
+        return '\n'.join(report)
+
+    def draw_left_line(self, img, lines, fit=None):
+        # y value for bottom left vertice...this is the
+        # principle y1 used during extrapolation
+        abs_max_y = self.vertices[0][0][1]
+
+        all_y2 = []
+        for line in lines:
+            all_y2.append(line.y2)
+
+        # Least squares is a wee bit smoother than simply averaging slopes and intercepts.
+        # RANSAC (see self.line_fitter) additionally ignores stray segments.
+        # process_batch passes in fits it already computed for the whole batch.
+        m, b = self.fit_line(lines) if fit is None else fit
+
+        # Computes the EMA of all measurements over time for an even more smooth/stable line
+        # See self.ema_period_alpha to adjust the number of elements in a given period
+        # to track.
+        self.l_m_measurements = np.append(self.l_m_measurements, m)
+        self.l_b_measurements = np.append(self.l_b_measurements, b)
+
+        self.l_m_ema = self.compute_ema(m, self.l_m_measurements, self.l_m_ema)
+        self.l_b_ema = self.compute_ema(b, self.l_b_measurements, self.l_b_ema)
+
+        if len(self.l_m_measurements) > self.ema_fps_period:
+            self.l_m_measurements = np.delete(self.l_m_measurements, 0)
+        if len(self.l_b_measurements) > self.ema_fps_period:
+            self.l_b_measurements = np.delete(self.l_b_measurements, 0)
+
+        # print("m=%s, b=%s, l_m_ema=%s, l_b_ema=%s" % (m, b, self.l_m_ema, self.l_b_ema))
+
+        m = self.l_m_ema
+        b = self.l_b_ema
+
+        # Smooth out our y2 by remembering the smallest y2.
+        # doesn't work well on curves, use lane_model='quadratic' for those
+
+        # extrapolate
+        if self.l_abs_min_y is None:
+            self.l_abs_min_y = min(all_y2)
+        y2 = min(self.l_abs_min_y, int(sum(all_y2) / len(all_y2)))
+        self.l_abs_min_y = y2
+
+        y1 = abs_max_y
+        x1 = int((y1 - b) / m)
+        x2 = int((y2 - b) / m)
+
+        self.left_lane = (x1, y1, x2, y2)
+        cv2.line(img, (x1, y1), (x2, y2), self.line_color, self.thickness)
+
+    def draw_right_line(self, img, lines, fit=None):
+        # y value for bottom right vertice
+        abs_max_y = self.vertices[0][3][1]
+
+        all_y1 = []
+        for line in lines:
+            all_y1.append(line.y1)
+
+        # Least squares is a wee bit smoother than simply averaging slopes and intercepts.
+        # RANSAC (see self.line_fitter) additionally ignores stray segments.
+        # process_batch passes in fits it already computed for the whole batch.
+        m, b = self.fit_line(lines) if fit is None else fit
+
+        # Computes the EMA of all measurements over time for an even more smooth/stable line
+        # See self.ema_period_alpha to adjust the number of elements in a given period
+        # to track.
+        self.r_m_measurements = np.append(self.r_m_measurements, m)
+        self.r_b_measurements = np.append(self.r_b_measurements, b)
+
+        self.r_m_ema = self.compute_ema(m, self.r_m_measurements, self.r_m_ema)
+        self.r_b_ema = self.compute_ema(b, self.r_b_measurements, self.r_b_ema)
+
+        if len(self.r_m_measurements) > self.ema_fps_period:
+            self.r_m_measurements = np.delete(self.r_m_measurements, 0)
+        if len(self.r_b_measurements) > self.ema_fps_period:
+            self.r_b_measurements = np.delete(self.r_b_measurements, 0)
+
+        # print("m=%s, b=%s, r_m_ema=%s, r_b_ema=%s" % (m, b, self.r_m_ema, self.r_b_ema))
+
+        m = self.r_m_ema
+        b = self.r_b_ema
+
+        # Smooth out our y1 by remembering the smallest y1
+        # doesn't work well on curves, use lane_model='quadratic' for those
+
+        # extrapolate
+        if self.r_abs_min_y is None:
+            self.r_abs_min_y = min(all_y1)
+        y1 = min(self.r_abs_min_y, int(sum(all_y1) / len(all_y1)))
+        self.r_abs_min_y = y1
+
+        x1 = int((self.r_abs_min_y - b) / m)
+        y2 = abs_max_y
+        x2 = int((y2 - b) / m)
+
+        self.right_lane = (x1, y1, x2, y2)
+        cv2.line(img, (x1, y1), (x2, y2), self.line_color, self.thickness)
+
+    def draw_tracked_lines(self, img, left_lines, right_lines, left_fit=None, right_fit=None):
+        """Kalman counterpart of draw_left_line and draw_right_line. Either list may be empty."""
+        left = None
+        if len(left_lines) > 0:
+            left = self.fit_line(left_lines) if left_fit is None else left_fit
+
+            all_y2 = [line.y2 for line in left_lines]
+            if self.l_abs_min_y is None:
+                self.l_abs_min_y = min(all_y2)
+            self.l_abs_min_y = min(self.l_abs_min_y, int(sum(all_y2) / len(all_y2)))
+
+        right = None
+        if len(right_lines) > 0:
+            right = self.fit_line(right_lines) if right_fit is None else right_fit
+
+            all_y1 = [line.y1 for line in right_lines]
+            if self.r_abs_min_y is None:
+                self.r_abs_min_y = min(all_y1)
+            self.r_abs_min_y = min(self.r_abs_min_y, int(sum(all_y1) / len(all_y1)))
+
+        left, right = self.kalman_tracker.update(left, right)
+
+        if left is not None:
+            m, b = left
+            y1 = self.vertices[0][0][1]
+            y2 = self.l_abs_min_y
+            self.left_lane = (int((y1 - b) / m), y1, int((y2 - b) / m), y2)
+            cv2.line(img, self.left_lane[:2], self.left_lane[2:], self.line_color, self.thickness)
+
+        if right is not None:
+            m, b = right
+            y1 = self.r_abs_min_y
+            y2 = self.vertices[0][3][1]
+            self.right_lane = (int((y1 - b) / m), y1, int((y2 - b) / m), y2)
+            cv2.line(img, self.right_lane[:2], self.right_lane[2:], self.line_color, self.thickness)
+
+    def draw_lines(self, img, lines):
+        """
+        NOTE: this is the function you might want to use as a starting point once you want to
+        average/extrapolate the line segments you detect to map out the full
+        extent of the lane (going from the result shown in raw-lines-example.mp4
+        to that shown in P1_example.mp4).
+
+        Think about things like separating line segments by their
+        slope ((y2-y1)/(x2-x1)) to decide which segments are part of the left
+        line vs. the right line.  Then, you can average the position of each of
+        the lines and extrapolate to the top and bottom of the lane.
+
+        This function draws `lines` with `color` and `thickness`.
+        Lines are drawn on the image inplace (mutates the image).
+        If you want to make the lines semi-transparent, think about combining
+        this function with the weighted_img() function below
+        """
+
+        self.left_lane = None
+        self.right_lane = None
+
+        if self.merge_segments:
+            lines = merge_collinear_segments(lines, self.vertices[0][0][1], self.merge_angle_bin,
+                                             self.merge_intercept_bin)
+
+        tracked = self.smoothing == 'kalman' and self.lane_model == 'linear'
+
+        if lines is None or len(lines) <= 0:
+            self.event_log.record('no_lines', self.current_frame)
+            if tracked:
+                self.draw_tracked_lines(img, [], [])
+            return
+
+        self.event_log.observe('segments', len(lines))
+
+        left_lines = []
+        right_lines = []
+
+        # This iteration splits each line into their respective line side bucket.
+        # Negative line angles are left lane lines
+        # Positive line angles are right lane lines
+        # We also filter out outlier lines such as horizontal lines by specifying a
+        # range of acceptable angles. There is likely a better way but I feel
+        # this is accurate enough for first pass.
+        for line in lines:
+            for x1, y1, x2, y2 in line:
+                # An offset may be specified to compensate for pixels that are made up by
+                # erroneous data such as a hood or dashboard reflection
+
+                # compute the angle of the line - it's just easier for me to visualize in
+                # degrees than float ranges
+                angle = math.atan2(y2 - y1, x2 - x1) * 180.0 / np.pi
+
+                if angle is not 0.:
+                    lane_line = LaneLine(x1, y1, x2, y2)
+
+                    # left lane line
+                    if -50 < angle <= -25:
+                        left_lines.append(lane_line)
+
+                    # right lane line
+                    elif 20 <= angle <= 45:
+                        right_lines.append(lane_line)
+
+                        # else:
+                        #     print('OOB line detected in frame ', self.current_frame, ': ', line_tuple)
+
+        self.draw_lane_lines(img, len(lines), left_lines, right_lines)
+
+    def draw_lane_lines(self, img, segment_count, left_lines, right_lines, left_fit=None, right_fit=None):
+        """
+        Second half of draw_lines, after the segments have been split into LaneLine lists.
+        `left_fit` and `right_fit` are (m, b) fits that were already computed, see process_batch.
+        """
+        tracked = self.smoothing == 'kalman' and self.lane_model == 'linear'
+
+        self.event_log.observe('left_segments', len(left_lines))
+        self.event_log.observe('right_segments', len(right_lines))
+
+        if len(left_lines) <= 0:
+            self.event_log.record('no_left_lines', self.current_frame, segments=segment_count)
+
+        if len(right_lines) <= 0:
+            self.event_log.record('no_right_lines', self.current_frame, segments=segment_count)
+
+        if tracked:
+            self.draw_tracked_lines(img, left_lines, right_lines, left_fit, right_fit)
+            return
+
+        if self.lane_model == 'quadratic':
+            self.draw_curves(img, left_lines, right_lines)
+
+        if len(left_lines) > 0 and self.lane_model == 'linear':
+            self.draw_left_line(img, left_lines, left_fit)
+
+        if len(right_lines) > 0 and self.lane_model == 'linear':
+            self.draw_right_line(img, right_lines, right_fit)
+
+    def hough_lines(self, orig_img, img):
+        """
+        `img` should be the output of a Canny transform.
+
+        Returns an image with hough lines drawn.
+        """
+        stage_start = time.perf_counter()
+        lines = self.detect_lines(img, orig_img.shape)
+        stage_start = self.stage_done(2, stage_start)
+
+        # line_img = np.zeros(img.shape, dtype=np.uint8)
+        line_img = np.copy(orig_img) * 0  # creating a blank to draw lines on
+
+        if self.perspective is not None:
+            self.draw_warped_lanes(line_img, lines, img.shape)
+        else:
+            self.draw_lines(line_img, lines)
+        self.stage_done(3, stage_start)
+        return line_img
+
+    def detect_lines(self, img, frame_shape):
+        """Runs the configured detector on the edge image `img` and returns its (N, 1, 4) segments or None."""
+        if self.detector == 'histogram':
+            vertices = self.vertices
+            if self.perspective is not None:
+                height, width = img.shape[:2]
+                vertices = np.array([[(0, height), (0, 0), (width, 0), (width, height)]], dtype=np.int32)
+            lines = self.sliding_window_detector.find_lines(img, vertices)
+        elif self.hough_threshold_controller is not None:
+            threshold = self.hough_threshold_controller.hough_threshold(self.hough_transform_pipeline)
+            lines = self.hough_transform_pipeline.find_lines(img, threshold)
+            self.hough_threshold_controller.update(0 if lines is None else len(lines), self.event_log)
+        else:
+            lines = self.hough_transform_pipeline.find_lines(img)
+
+        if self.segment_recorder is not None:
+            self.segment_recorder.record(lines, frame_shape)
+
+        return lines
+
+    @staticmethod
+    def weighted_img(img, initial_img, α=0.8, β=1., λ=0.):
+        """
+        `img` is the output of the hough_lines(), An image with lines drawn on it.
+        Should be a blank image (all black) with lines drawn on it.
+
+        `initial_img` should be the image before any processing.
+
+        The result image is computed as follows:
+
+        initial_img * α + img * β + λ
+        NOTE: initial_img and img must be the same shape!
+        """
+        return cv2.addWeighted(initial_img, α, img, β, λ)
@@ -0,0 +1,51 @@
+import numpy as np
+
+from lanelines.hough import HoughTransformPipeline
+from lanelines.pipeline import PipelineContext
+
+# PipelineContext keyword arguments for each clip we've tuned for. They're plain dicts so they
+# can be overridden, compared and sent to other processes.
+PRESETS = {
+    # This pipeline context is sufficient for all test_images as well as for solidWhiteRight.mp4
+    'white': dict(gaussian_kernel_size=3, canny_low_threshold=50, canny_high_threshold=150,
+                  region_bottom_offset=55,
+                  region_vertice_weights=np.array([(1, 1), (0.48, 0.60), (0.54, 0.60), (1, 1)]),
+                  hough_transform_pipeline=dict(rho=2, theta=np.pi / 180, threshold=20, min_line_length=50,
+                                                max_line_gap=200),
+                  line_color=[0, 140, 255],
+                  ema_period_alpha=2),
+
+    # solidYellowLeft.mp4
+    'yellow': dict(gaussian_kernel_size=3, canny_low_threshold=50, canny_high_threshold=150,
+                   region_bottom_offset=55,
+                   region_vertice_weights=np.array([(1, 1), (0.48, 0.61), (0.54, 0.60), (1, 1)]),
+                   hough_transform_pipeline=dict(rho=2, theta=np.pi / 180, threshold=20, min_line_length=50,
+                                                 max_line_gap=200),
+                   line_color=[0, 140, 255],
+                   ema_period_alpha=1),
+
+    # challenge.mp4
+    'challenge': dict(gaussian_kernel_size=3, canny_low_threshold=50, canny_high_threshold=150,
+                      colorspace='hsv',
+                      region_bottom_offset=55,
+                      region_vertice_weights=np.array([(1, 0.95), (0.40, 0.65), (0.60, 0.65), (1, 0.935)]),
+                      hough_transform_pipeline=dict(rho=2, theta=np.pi / 180, threshold=20, min_line_length=15,
+                                                    max_line_gap=350),
+                      line_color=[0, 140, 255],
+                      ema_period_alpha=2)
+}
+
+
+def create_pipeline_context(preset, **overrides):
+    """
+    Builds a PipelineContext from one of PRESETS (or a dict of the same shape).
+    `overrides` replace individual PipelineContext arguments.
+    """
+    kwargs = dict(PRESETS[preset] if isinstance(preset, str) else preset)
+    kwargs.update(overrides)
+
+    hough = kwargs.get('hough_transform_pipeline')
+    if isinstance(hough, dict):
+        kwargs['hough_transform_pipeline'] = HoughTransformPipeline(**hough)
+
+    return PipelineContext(**kwargs)
@@ -0,0 +1,88 @@
+"""
+Render pass decoupled from detection.
+
+A lane track is the (frames, 2, 4) float array of left and right lane endpoints that
+process_video_luma, lanelines.replay.replay and detect_track return (NaN where a lane
+wasn't drawn). Once a clip's track is saved, changing line_color, thickness or the
+weighted_img blend only needs render_track: it decodes the source, draws the stored
+endpoints and streams the result into the encoder, without running any vision stage.
+"""
+import cv2
+import numpy as np
+
+from lanelines.pipeline import PipelineContext
+
+
+def save_track(path, lanes, fps=None):
+    np.savez(path, lanes=np.asarray(lanes, dtype=np.float64), fps=np.nan if fps is None else fps)
+
+
+def load_track(path):
+    """Returns (lanes, fps) as written by save_track. fps is None when it wasn't saved."""
+    with np.load(path) as track:
+        fps = float(track['fps'])
+        return track['lanes'], None if np.isnan(fps) else fps
+
+
+def detect_track(pipeline_context, src_video_path):
+    """Runs the full pipeline over `src_video_path` and returns its lane track instead of a video."""
+    from lanelines.video import iter_frames
+
+    pipeline_context.current_frame = 0
+    lanes = []
+    for frame in iter_frames(src_video_path):
+        pipeline_context.process_image(frame)
+        left_lane, right_lane = pipeline_context.left_lane, pipeline_context.right_lane
+        lanes.append((left_lane if left_lane is not None else (np.nan,) * 4,
+                      right_lane if right_lane is not None else (np.nan,) * 4))
+
+    return np.array(lanes, dtype=np.float64).reshape((-1, 2, 4))
+
+
+def track_endpoints(lanes):
+    """Integer endpoints of a whole track at once as ((frames, 2, 2, 2) int32 points, (frames, 2) drawn mask)."""
+    lanes = np.asarray(lanes, dtype=np.float64)
+    drawn = ~np.isnan(lanes).any(axis=2)
+    points = np.where(drawn[:, :, np.newaxis], lanes, 0).astype(np.int32).reshape((-1, 2, 2, 2))
+    return points, drawn
+
+
+def render_frame(frame, points, drawn, line_img, line_color, thickness, α=0.8, β=0.6, λ=0.):
+    """
+    Draws one frame's lanes from track_endpoints onto the scratch `line_img` and blends.
+
+    The lines and the blend are the ones process_image produces, so rendering the track
+    of a straight-line (linear lane model) run reproduces that run's frames exactly.
+    """
+    line_img[:] = 0
+    for lane in range(2):
+        if drawn[lane]:
+            cv2.line(line_img, tuple(points[lane, 0]), tuple(points[lane, 1]), line_color, thickness)
+
+    return PipelineContext.weighted_img(line_img, frame, α, β, λ)
+
+
+def render_track(src_video_path, dst_video_path, lanes, line_color=(255, 0, 0), thickness=5, α=0.8, β=0.6, λ=0.,
+                 codec='libx264', preset='medium', bitrate=None):
+    """
+    Writes `src_video_path` with the lane track `lanes` drawn on it to `dst_video_path`.
+
+    Frames are decoded, drawn on and encoded one at a time, so memory stays at a couple of
+    frames whatever the length of the clip. Returns the number of frames written.
+    """
+    from lanelines.video import VideoWriter, iter_frames, video_info
+
+    fps, duration, n_frames, size = video_info(src_video_path)
+    points, drawn = track_endpoints(lanes)
+
+    line_img = None
+    with VideoWriter(dst_video_path, size, fps, codec=codec, preset=preset, bitrate=bitrate) as writer:
+        for frame_index, frame in enumerate(iter_frames(src_video_path)):
+            if frame_index >= len(points):
+                break
+            if line_img is None:
+                line_img = np.zeros_like(frame)
+            writer.write(render_frame(frame, points[frame_index], drawn[frame_index], line_img, line_color,
+                                      thickness, α, β, λ))
+
+    return writer.frames_written
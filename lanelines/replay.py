@@ -0,0 +1,86 @@
+"""
+Record and replay of raw Hough output.
+
+Tuning draw_lines, the line fitters and the smoothing doesn't need the video at all, only
+each frame's HoughLinesP segments. SegmentRecorder appends them to `<path>.segments` as a
+flat int16 array (x1, y1, x2, y2 per segment). On close it writes `<path>.index.npz` with
+each frame's offset into that array and the frame shape. SegmentLog memory-maps both, and
+replay() feeds a log through the classification, fitting and smoothing stages of any
+PipelineContext. No decoding, Canny or Hough is repeated.
+"""
+import numpy as np
+
+
+class SegmentRecorder:
+    """Pass as PipelineContext(segment_recorder=...) to log every frame's segments."""
+
+    def __init__(self, path):
+        self.path = path
+        self.segments_file = open(path + '.segments', 'wb')
+        self.offsets = [0]
+        self.frame_shape = None
+
+    def record(self, lines, frame_shape):
+        if self.frame_shape is None:
+            self.frame_shape = frame_shape
+
+        if lines is not None and len(lines) > 0:
+            segments = np.asarray(lines, dtype=np.int16).reshape((-1, 4))
+            self.segments_file.write(segments.tobytes())
+            self.offsets.append(self.offsets[-1] + len(segments))
+        else:
+            self.offsets.append(self.offsets[-1])
+
+    def close(self):
+        self.segments_file.close()
+        np.savez(self.path + '.index.npz', offsets=np.array(self.offsets, dtype=np.int64),
+                 frame_shape=np.array(self.frame_shape, dtype=np.int64))
+
+
+class SegmentLog:
+    """Read-only, memory-mapped view of a log written by SegmentRecorder."""
+
+    def __init__(self, path):
+        with np.load(path + '.index.npz') as index:
+            self.offsets = index['offsets']
+            self.frame_shape = tuple(index['frame_shape'])
+
+        if self.offsets[-1] > 0:
+            self.segments = np.memmap(path + '.segments', dtype=np.int16, mode='r').reshape((-1, 4))
+        else:
+            self.segments = np.empty((0, 4), dtype=np.int16)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, frame):
+        """Returns frame `frame`'s segments as HoughLinesP would have, (N, 1, 4) int32 or None."""
+        start, end = self.offsets[frame], self.offsets[frame + 1]
+        if start == end:
+            return None
+        return self.segments[start:end].astype(np.int32).reshape((-1, 1, 4))
+
+
+def replay(pipeline_context, segment_log):
+    """
+    Runs `segment_log` through pipeline_context.draw_lines frame by frame.
+
+    Returns a (frames, 2, 4) float array of the left and right lane endpoints that would
+    have been drawn, NaN where a lane wasn't drawn.
+    """
+    pipeline_context.update_vertices(segment_log.frame_shape)
+
+    # lines are still drawn, on a single scratch image that is never looked at
+    scratch = np.zeros(segment_log.frame_shape, dtype=np.uint8)
+
+    lanes = np.full((len(segment_log), 2, 4), np.nan)
+    for frame in range(len(segment_log)):
+        pipeline_context.current_frame += 1
+        pipeline_context.draw_lines(scratch, segment_log[frame])
+
+        if pipeline_context.left_lane is not None:
+            lanes[frame, 0] = pipeline_context.left_lane
+        if pipeline_context.right_lane is not None:
+            lanes[frame, 1] = pipeline_context.right_lane
+
+    return lanes
@@ -0,0 +1,110 @@
+import collections
+
+import cv2
+import numpy as np
+
+
+class FrameScreen:
+    """
+    Cheap check for frames that aren't worth running blur, Canny and Hough on.
+
+    Tunnels, night, glare and heavy rain mostly end in "no lines" anyway, after paying
+    for the full pipeline. The region of interest is cut out of the gray channel and
+    shrunk by `scale` in each direction, which leaves a few hundred pixels to look at:
+    their mean luma, their contrast (standard deviation) and the fraction of them with a
+    gradient above `gradient_threshold` (edge density). A frame is unusable when it is
+    too dark or too bright, too flat, or has next to no edges or edges everywhere.
+    """
+
+    def __init__(self, scale=8, gradient_threshold=12, min_luma=25., max_luma=235., min_contrast=8.,
+                 min_edge_density=0.005, max_edge_density=0.4):
+        self.scale = scale
+        self.gradient_threshold = gradient_threshold
+        self.min_luma = min_luma
+        self.max_luma = max_luma
+        self.min_contrast = min_contrast
+        self.min_edge_density = min_edge_density
+        self.max_edge_density = max_edge_density
+
+        self.frames = 0
+        self.skipped = collections.Counter()
+
+    def thresholds(self):
+        return {
+            'scale': self.scale,
+            'gradient_threshold': self.gradient_threshold,
+            'min_luma': self.min_luma,
+            'max_luma': self.max_luma,
+            'min_contrast': self.min_contrast,
+            'min_edge_density': self.min_edge_density,
+            'max_edge_density': self.max_edge_density
+        }
+
+    def measure(self, gray_img, vertices):
+        """Returns (mean luma, contrast, edge density) of the region `vertices` of `gray_img`."""
+        x, y, width, height = cv2.boundingRect(vertices.reshape((-1, 2)).astype(np.int32))
+        x, y = max(0, x), max(0, y)
+        roi = gray_img[y:y + height, x:x + width]
+
+        small_size = (max(2, roi.shape[1] // self.scale), max(2, roi.shape[0] // self.scale))
+        small = cv2.resize(roi, small_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+        mask = np.zeros(small.shape, dtype=np.uint8)
+        small_vertices = (vertices.reshape((-1, 2)) - (x, y)) * (small_size[0] / roi.shape[1],
+                                                                  small_size[1] / roi.shape[0])
+        cv2.fillPoly(mask, [small_vertices.astype(np.int32)], 1)
+        inside = mask > 0
+
+        pixels = small[inside]
+        if len(pixels) == 0:
+            return 0., 0., 0.
+
+        # forward differences, the last row/column just repeat the one before
+        gradient = np.zeros(small.shape, dtype=np.int16)
+        gradient[:, :-1] = np.abs(np.diff(small, axis=1))
+        gradient[:-1] += np.abs(np.diff(small, axis=0))
+
+        edge_density = np.count_nonzero(gradient[inside] > self.gradient_threshold) / len(pixels)
+        return pixels.mean(), pixels.std(), edge_density
+
+    def verdict(self, luma, contrast, edge_density):
+        """Returns why a frame with these measurements is unusable, or None when it is fine."""
+        if luma < self.min_luma:
+            return 'dark'
+        if luma > self.max_luma:
+            return 'bright'
+        if contrast < self.min_contrast:
+            return 'low_contrast'
+        if edge_density < self.min_edge_density:
+            return 'no_edges'
+        if edge_density > self.max_edge_density:
+            return 'cluttered'
+        return None
+
+    def screen(self, gray_img, vertices, event_log, frame):
+        """Returns True when the frame should go through detection. Measurements go to `event_log`."""
+        luma, contrast, edge_density = self.measure(gray_img, vertices)
+        event_log.observe('screen_luma', luma)
+        event_log.observe('screen_contrast', contrast)
+        event_log.observe('screen_edge_density', edge_density)
+
+        self.frames += 1
+        reason = self.verdict(luma, contrast, edge_density)
+        if reason is None:
+            return True
+
+        self.skipped[reason] += 1
+        event_log.record('skipped_frame', frame, reason=reason, luma=float(luma), contrast=float(contrast),
+                         edge_density=float(edge_density))
+        return False
+
+    def report(self):
+        """Skip rate, skips per reason and the thresholds they were judged by."""
+        skipped = sum(self.skipped.values())
+        return {
+            'frames': self.frames,
+            'skipped': skipped,
+            'skip_rate': skipped / self.frames if self.frames else 0.,
+            'skipped_by_reason': dict(self.skipped),
+            'thresholds': self.thresholds()
+        }
@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+class StripedEdgeDetector:
+    """
+    Gaussian blur + Canny on horizontal stripes of a frame, run concurrently on a thread pool.
+
+    OpenCV releases the GIL so the stripes really run in parallel, which lowers the latency
+    of a single (large) frame rather than raising throughput over many. Each stripe is
+    blurred and run through Canny together with `overlap` rows of its neighbours (the blur
+    radius plus one row for the Sobel and one for non maximum suppression), so pixel values,
+    gradients and the suppression are exact in the stripe's own rows.
+
+    Hysteresis is not local though: a weak edge pixel survives if it connects to a strong
+    one anywhere in the frame, and inside the overlap a stripe sees wrong strong pixels.
+    Both only matter for components of weak/strong pixels that reach a seam, everything
+    else already is exact. So after the stripes are done, a band of rows around every seam
+    gets a candidate map (Canny with both thresholds at `low`) and a strong map (both at
+    `high`). The components of the candidate map that touch the seam are kept only when
+    they contain a strong pixel. The band starts at `window` rows either side of the seam
+    and only grows, computing the maps for the rows it adds, when one of those components
+    runs off its ends. That is exactly what cv2.Canny does on the whole frame, bit for bit.
+    """
+
+    def __init__(self, n_stripes=4, executor=None, window=32):
+        self.n_stripes = n_stripes
+        self.executor = executor if executor is not None else ThreadPoolExecutor(n_stripes)
+        self.window = window
+
+    def stripe_bounds(self, height):
+        edges = np.linspace(0, height, self.n_stripes + 1).astype(int)
+        return [(start, end) for start, end in zip(edges[:-1], edges[1:]) if end > start]
+
+    def resolve_seams(self, edges, gray_img, seams, kernel_size, low_threshold, high_threshold):
+        """Redoes the hysteresis of every candidate component crossing the seam above each row in `seams`, in place."""
+        height, width = edges.shape
+        overlap = kernel_size // 2 + 2
+        candidates = np.empty_like(edges)
+        strong = np.empty_like(edges)
+        computed = np.zeros(height, dtype=bool)
+
+        def compute_maps(top, bottom):
+            # only the rows no earlier band has covered, one run of them at a time
+            missing = np.concatenate(([0], ~computed[top:bottom], [0])).astype(np.int8)
+            changes = np.flatnonzero(np.diff(missing))
+            for run_top, run_bottom in zip(top + changes[::2], top + changes[1::2]):
+                blur_top = max(0, run_top - overlap)
+                blur_bottom = min(height, run_bottom + overlap)
+                blur_img = cv2.GaussianBlur(gray_img[blur_top:blur_bottom], (kernel_size, kernel_size), 0)
+                rows = slice(run_top - blur_top, run_bottom - blur_top)
+                candidates[run_top:run_bottom] = cv2.Canny(blur_img, low_threshold, low_threshold)[rows]
+                strong[run_top:run_bottom] = cv2.Canny(blur_img, high_threshold, high_threshold)[rows]
+            computed[top:bottom] = True
+
+        # the component being filled is marked 2 in `fill` and finished ones 1, floodFill doesn't cross either
+        flags = 8 | (2 << 8) | cv2.FLOODFILL_MASK_ONLY | cv2.FLOODFILL_FIXED_RANGE
+
+        for seam in seams:
+            top, bottom = max(0, seam - self.window), min(height, seam + self.window)
+            compute_maps(top, bottom)
+            fill = np.zeros((bottom - top + 2, width + 2), dtype=np.uint8)
+
+            for row in (seam - 1, seam):
+                for x in np.flatnonzero(candidates[row]):
+                    if fill[row - top + 1, x + 1]:
+                        continue
+
+                    while True:
+                        x0, y0, w, h = cv2.floodFill(candidates[top:bottom], fill, (int(x), int(row - top)), 0, 0,
+                                                     0, flags)[3]
+                        runs_off_top = y0 == 0 and top > 0
+                        runs_off_bottom = y0 + h == bottom - top and bottom < height
+                        if not runs_off_top and not runs_off_bottom:
+                            break
+
+                        # the component may reach a strong pixel outside of the band, and its pixels there
+                        # may be wrong as well, so double the band on that side and fill it again
+                        fill[fill == 2] = 0
+                        size = bottom - top
+                        new_top = max(0, top - size) if runs_off_top else top
+                        new_bottom = min(height, bottom + size) if runs_off_bottom else bottom
+                        compute_maps(new_top, new_bottom)
+                        new_fill = np.zeros((new_bottom - new_top + 2, width + 2), dtype=np.uint8)
+                        new_fill[top - new_top + 1:bottom - new_top + 1] = fill[1:-1]
+                        top, bottom, fill = new_top, new_bottom, new_fill
+
+                    box = fill[y0 + 1:y0 + h + 1, x0 + 1:x0 + w + 1]
+                    component = box == 2
+                    is_edge = np.any(strong[top + y0:top + y0 + h, x0:x0 + w][component])
+                    edges[top + y0:top + y0 + h, x0:x0 + w][component] = 255 if is_edge else 0
+                    box[component] = 1
+
+    def find_edges(self, gray_img, kernel_size, low_threshold, high_threshold):
+        """Same result as cv2.Canny(cv2.GaussianBlur(gray_img, (kernel_size, kernel_size), 0), low, high)."""
+        overlap = kernel_size // 2 + 2
+        bounds = self.stripe_bounds(gray_img.shape[0])
+
+        edges = np.empty(gray_img.shape[:2], dtype=np.uint8)
+
+        def stripe(bound):
+            start, end = bound
+            top = max(0, start - overlap)
+            bottom = min(gray_img.shape[0], end + overlap)
+
+            blur_img = cv2.GaussianBlur(gray_img[top:bottom], (kernel_size, kernel_size), 0)
+            edges[start:end] = cv2.Canny(blur_img, low_threshold, high_threshold)[start - top:end - top]
+
+        list(self.executor.map(stripe, bounds))
+
+        if len(bounds) > 1:
+            self.resolve_seams(edges, gray_img, [start for start, end in bounds[1:]], kernel_size, low_threshold,
+                               high_threshold)
+
+        return edges
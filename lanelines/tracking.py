@@ -0,0 +1,72 @@
+import numpy as np
+
+from lanelines.constants import FPS
+
+
+class LaneKalmanTracker:
+    """
+    Constant velocity Kalman filter over the (m, b) of both lane lines.
+
+    The state is (l_m, l_b, r_m, r_b) followed by their per-frame velocities so both
+    lanes are predicted and corrected with a single 8x8 matrix update per frame.
+    A missing lane simply contributes no measurement rows and coasts on its
+    predicted velocity until it has been missing for max_missed_frames.
+    """
+
+    def __init__(self, slope_process_std=0.005, intercept_process_std=3., slope_measurement_std=0.05,
+                 intercept_measurement_std=20., max_missed_frames=FPS):
+        self.max_missed_frames = max_missed_frames
+
+        identity = np.eye(4)
+        self.F = np.block([[identity, identity], [np.zeros((4, 4)), identity]])
+        self.H = np.hstack((identity, np.zeros((4, 4))))
+
+        process_var = np.array([slope_process_std, intercept_process_std] * 2) ** 2
+        self.Q = np.diag(np.concatenate((process_var, process_var)))
+        self.R = np.diag(np.array([slope_measurement_std, intercept_measurement_std] * 2) ** 2)
+
+        self.x = np.zeros(8)
+        # a huge initial uncertainty makes the first measurement of each lane overwrite the state
+        self.P = np.eye(8) * 1e6
+
+        self.missed_frames = np.full(2, max_missed_frames + 1)
+
+    def update(self, left, right):
+        """
+        Advances the filter by one frame. `left` and `right` are (m, b) measurements
+        or None when that lane wasn't detected.
+
+        Returns ((l_m, l_b), (r_m, r_b)) with None for lanes that aren't being tracked.
+        """
+        x = np.dot(self.F, self.x)
+        P = np.dot(np.dot(self.F, self.P), self.F.T) + self.Q
+
+        observed = np.array([left is not None, right is not None])
+        rows = np.repeat(observed, 2)
+
+        if observed.any():
+            z = np.concatenate([measurement for measurement in (left, right) if measurement is not None])
+            H = self.H[rows]
+            R = self.R[np.ix_(rows, rows)]
+
+            S = np.dot(np.dot(H, P), H.T) + R
+            K = np.dot(np.dot(P, H.T), np.linalg.inv(S))
+            x = x + np.dot(K, z - np.dot(H, x))
+            P = P - np.dot(np.dot(K, H), P)
+
+        self.x = x
+        self.P = P
+        self.missed_frames = np.where(observed, 0, self.missed_frames + 1)
+
+        tracked = self.missed_frames <= self.max_missed_frames
+        left_line = (x[0], x[1]) if tracked[0] else None
+        right_line = (x[2], x[3]) if tracked[1] else None
+        return left_line, right_line
+
+    def get_state(self):
+        return {'x': self.x.copy(), 'P': self.P.copy(), 'missed_frames': self.missed_frames.copy()}
+
+    def set_state(self, state):
+        self.x = np.array(state['x'], dtype=np.float64)
+        self.P = np.array(state['P'], dtype=np.float64)
+        self.missed_frames = np.array(state['missed_frames'])
@@ -0,0 +1,123 @@
+"""
+Small wrappers around moviepy's ffmpeg reader/writer.
+
+moviepy is imported inside each function so importing lanelines stays cheap.
+"""
+import os
+import re
+import subprocess
+import tempfile
+
+import numpy as np
+
+
+def ffmpeg_binary():
+    from moviepy.config import get_setting
+    return get_setting('FFMPEG_BINARY')
+
+
+def video_info(path):
+    """Returns (fps, duration in seconds, number of frames, (width, height)) for `path`."""
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+    infos = ffmpeg_parse_infos(path)
+    return infos['video_fps'], infos['video_duration'], infos['video_nframes'], tuple(infos['video_size'])
+
+
+def keyframe_times(path):
+    """Returns the presentation times (seconds) of every keyframe in `path` without decoding the other frames."""
+    command = [ffmpeg_binary(), '-hide_banner', '-skip_frame', 'nokey', '-i', path, '-an', '-vf', 'showinfo',
+               '-f', 'null', '-']
+    output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    return [float(time) for time in re.findall(r'pts_time:\s*([0-9.]+)', output.stderr)]
+
+
+def iter_frames(path, start_time=0, end_time=None):
+    """Yields RGB uint8 frames of `path` between `start_time` and `end_time` (seconds)."""
+    from moviepy.editor import VideoFileClip
+
+    clip = VideoFileClip(path, audio=False)
+    try:
+        if start_time > 0 or end_time is not None:
+            clip = clip.subclip(start_time, end_time)
+        for frame in clip.iter_frames(dtype='uint8'):
+            yield frame
+    finally:
+        clip.close()
+
+
+def sample_frames(path, n_samples):
+    """
+    Returns `n_samples` RGB frames spread evenly over `path`, one from the middle of each
+    of n_samples equal stretches. moviepy seeks to each one, the rest is never decoded.
+    """
+    from moviepy.editor import VideoFileClip
+
+    clip = VideoFileClip(path, audio=False)
+    try:
+        times = (np.arange(n_samples) + 0.5) * clip.duration / n_samples
+        return [clip.get_frame(time).astype(np.uint8) for time in times]
+    finally:
+        clip.close()
+
+
+class VideoWriter:
+    """Streams RGB frames into an H.264 file one at a time."""
+
+    def __init__(self, path, size, fps, codec='libx264', preset='medium', bitrate=None):
+        from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+        self.writer = FFMPEG_VideoWriter(path, size, fps, codec=codec, preset=preset, bitrate=bitrate)
+        self.frames_written = 0
+
+    def write(self, frame):
+        self.writer.write_frame(frame)
+        self.frames_written += 1
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def concatenate_videos(paths, dst_path):
+    """Joins videos encoded with identical settings into `dst_path` without re-encoding them."""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as playlist:
+        for path in paths:
+            playlist.write("file '%s'\n" % os.path.abspath(path))
+
+    try:
+        subprocess.check_call([ffmpeg_binary(), '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                               '-i', playlist.name, '-c', 'copy', dst_path])
+    finally:
+        os.remove(playlist.name)
+
+
+def iter_luma_frames(path):
+    """
+    Yields only the luma (Y) plane of every frame of `path` as HxW uint8 arrays.
+
+    ffmpeg's extractplanes filter hands over the decoder's Y plane as is, so no RGB frame
+    is ever built and a third of the bytes of an RGB24 frame cross the pipe. The values are
+    the stream's own (usually limited range, 16..235) luma, not cv2's RGB to YUV result.
+    """
+    fps, duration, n_frames, (width, height) = video_info(path)
+    frame_size = width * height
+
+    command = [ffmpeg_binary(), '-loglevel', 'error', '-i', path, '-an', '-vf', 'extractplanes=y',
+               '-f', 'rawvideo', '-pix_fmt', 'gray', '-']
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=frame_size * 4)
+    try:
+        while True:
+            buffer = process.stdout.read(frame_size)
+            if len(buffer) < frame_size:
+                break
+            yield np.frombuffer(buffer, dtype=np.uint8).reshape((height, width))
+    finally:
+        process.stdout.close()
+        process.terminate()
+        process.wait()
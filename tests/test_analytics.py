@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from lanelines import LaneKalmanTracker, create_pipeline_context
+from lanelines.analytics import clip_analytics, event_index, lines_from_track
+
+HEIGHT, WIDTH = 540, 960
+VANISHING_POINT = (480., 318.)
+LANE_WIDTH = 700.
+
+
+def lane_segments(shift):
+    """A few HoughLinesP style pieces of both lane lines, the whole layout moved `shift` pixels sideways."""
+    segments = []
+    for bottom_x in (130., 130. + LANE_WIDTH):
+        slope = (VANISHING_POINT[1] - HEIGHT) / (VANISHING_POINT[0] - bottom_x)
+        for y1, y2 in ((530, 480), (460, 420), (400, 350)):
+            x1, x2 = bottom_x + shift + (y1 - HEIGHT) / slope, bottom_x + shift + (y2 - HEIGHT) / slope
+            segments.append((x1, y1, x2, y2) if x1 < x2 else (x2, y2, x1, y1))
+    return np.rint(segments).astype(np.int32).reshape((-1, 1, 4))
+
+
+def draw_lines_track(pipeline_context, shifts):
+    # one blank frame sets up the region of interest
+    pipeline_context.process_image(np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8))
+
+    lanes = np.full((len(shifts), 2, 4), np.nan)
+    for frame, shift in enumerate(shifts):
+        pipeline_context.current_frame += 1
+        pipeline_context.draw_lines(np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8), lane_segments(shift))
+        if pipeline_context.left_lane is not None:
+            lanes[frame, 0] = pipeline_context.left_lane
+        if pipeline_context.right_lane is not None:
+            lanes[frame, 1] = pipeline_context.right_lane
+    return lanes
+
+
+@pytest.mark.parametrize('smoothing', ['ema', 'kalman'])
+def test_lane_changes_in_smoothed_draw_lines_output(smoothing):
+    if smoothing == 'kalman':
+        pipeline_context = create_pipeline_context('white', smoothing='kalman', kalman_tracker=LaneKalmanTracker())
+    else:
+        pipeline_context = create_pipeline_context('white')
+
+    # the lane center moves up by almost a lane width (a change to the right) and back later
+    lanes = draw_lines_track(pipeline_context, [0.] * 90 + [650.] * 120 + [0.] * 120)
+    m, b = lines_from_track(lanes)
+    analytics = clip_analytics(m, b, (HEIGHT, WIDTH))
+
+    # smoothing spreads the move over many frames, no single frame jumps by half a lane
+    assert np.nanmax(np.abs(np.diff(analytics['offset']))) < LANE_WIDTH / 2
+    assert analytics['summary']['lane_changes'] == 2
+
+    index = event_index(analytics['events'])
+    changes = index[np.char.startswith(index['kind'], 'lane_change')]
+    assert changes['kind'].tolist() == ['lane_change_right', 'lane_change_left']
+    assert 90 <= changes['start'][0] < 150
+    assert 210 <= changes['start'][1] < 270
+
+
+def test_no_lane_changes_while_keeping_the_lane():
+    lanes = draw_lines_track(create_pipeline_context('white'), 60 * np.sin(np.linspace(0, 6 * np.pi, 600)))
+    m, b = lines_from_track(lanes)
+    assert clip_analytics(m, b, (HEIGHT, WIDTH))['summary']['lane_changes'] == 0
@@ -0,0 +1,55 @@
+import itertools
+import json
+import os
+
+import numpy as np
+import pytest
+
+from lanelines import LaneKalmanTracker, create_pipeline_context
+from lanelines.histogram import SlidingWindowDetector
+from lanelines.video import iter_frames
+
+VIDEO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'solidWhiteRight.mp4')
+
+CONFIGS = {
+    'white': lambda: create_pipeline_context('white'),
+    'yellow': lambda: create_pipeline_context('yellow'),
+    'challenge': lambda: create_pipeline_context('challenge'),
+    'kalman': lambda: create_pipeline_context('white', kalman_tracker=LaneKalmanTracker()),
+    'merge_segments': lambda: create_pipeline_context('white', merge_segments=True),
+    'ransac': lambda: create_pipeline_context('white', line_fitter='ransac'),
+    'quadratic': lambda: create_pipeline_context('white', lane_model='quadratic'),
+    'histogram': lambda: create_pipeline_context('white', sliding_window_detector=SlidingWindowDetector()),
+}
+
+
+@pytest.fixture(scope='module')
+def frames():
+    frames = np.array(list(itertools.islice(iter_frames(VIDEO), 60)))
+    # a blank frame and blanked halves so the no_lines/no_left_lines/no_right_lines paths run too
+    width = frames.shape[2]
+    frames[10] = 0
+    frames[20, :, :width // 2] = 0
+    frames[30, :, width // 2:] = 0
+    return frames
+
+
+@pytest.mark.parametrize('config', sorted(CONFIGS))
+def test_process_batch_matches_process_image(frames, config):
+    per_frame = CONFIGS[config]()
+    expected = np.array([per_frame.process_image(frame) for frame in frames])
+
+    batched = CONFIGS[config]()
+    # uneven batches so state carries over batch boundaries
+    output = np.concatenate([batched.process_batch(frames[start:start + 25]) for start in range(0, len(frames), 25)])
+
+    assert np.array_equal(output, expected)
+
+    expected_summary = per_frame.event_log.close()
+    summary = batched.event_log.close()
+    json.dumps(summary)
+    assert summary['counters'] == expected_summary['counters']
+    assert summary['suppressed_events'] == expected_summary['suppressed_events']
+    assert summary['observations'].keys() == expected_summary['observations'].keys()
+    for name, observation in summary['observations'].items():
+        assert observation == pytest.approx(expected_summary['observations'][name], rel=1e-9)
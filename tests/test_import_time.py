@@ -0,0 +1,17 @@
+from lanelines.benchmarks import check_import_time, measure_import_time
+
+
+def test_import_loads_no_heavy_modules():
+    elapsed, heavy = measure_import_time('lanelines')
+    assert not heavy, 'importing lanelines loaded %s' % ', '.join(heavy)
+
+
+def test_import_time_budget():
+    check_import_time()
+
+
+def test_import_overhead_over_dependencies():
+    # NumPy and OpenCV dominate and vary from machine to machine, what we control is what
+    # lanelines adds once they are loaded (~13 ms when this test was written)
+    elapsed = measure_import_time('lanelines', preload=('numpy', 'cv2'))[0]
+    assert elapsed <= 0.05, 'lanelines adds %.0f ms on top of numpy and cv2' % (elapsed * 1e3)
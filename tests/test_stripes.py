@@ -0,0 +1,24 @@
+import cv2
+import numpy as np
+import pytest
+
+from lanelines.stripes import StripedEdgeDetector
+
+
+@pytest.mark.parametrize('n_stripes', [1, 2, 3, 4, 8, 16])
+def test_striped_edges_match_unsplit(n_stripes):
+    rng = np.random.default_rng(n_stripes)
+    # a small window so components run off the seam bands and the bands have to grow
+    detector = StripedEdgeDetector(n_stripes, window=4)
+
+    for _ in range(10):
+        noise = rng.integers(0, 256, (int(rng.integers(40, 240)), int(rng.integers(40, 240))), dtype=np.uint8)
+        gray_img = cv2.GaussianBlur(noise, (0, 0), rng.uniform(0.5, 3.))
+
+        for kernel_size, low_threshold, high_threshold in ((3, 50, 150), (5, 20, 60), (3, 10, 200)):
+            expected = cv2.Canny(cv2.GaussianBlur(gray_img, (kernel_size, kernel_size), 0), low_threshold,
+                                 high_threshold)
+            edges = detector.find_edges(gray_img, kernel_size, low_threshold, high_threshold)
+            assert np.array_equal(edges, expected)
+
+    detector.executor.shutdown()